@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Micro-benchmarks for the news_munger hot paths.
+
+Run all of them with `python benchmarks.py`, or name the ones to run:
+`python benchmarks.py normalize_text`
+"""
+
+import io
+import re
+import sys
+import glob
+import timeit
+from contextlib import redirect_stdout
+
+# pylint: disable=import-outside-toplevel
+# Each benchmark imports only what it measures
+
+
+def bench_normalize_text(paragraphs=2000, quotes=12, number=5):
+
+    """Time helpers.normalize_text on a long, quote-heavy article """
+
+    from helpers import normalize_text
+
+    paragraph = " ".join(
+        '"Quote number {}," said the spokesperson.'.format(n) for n in range(quotes)
+    )
+    text = "WASHINGTON (AP) — {}\n".format(paragraph)
+    text += "\n".join(paragraph for _ in range(paragraphs))
+    text += "\n___\nAssociated Press writer Jane Doe contributed."
+    seconds = timeit.timeit(lambda: normalize_text(text), number=number) / number
+
+    return {
+        "chars": len(text),
+        "quotes": text.count('"'),
+        "seconds": round(seconds, 5),
+    }
+
+
+def bench_ap_article(pattern="fixtures/ap_article*.html", number=20):
+
+    """Compare per-article CPU time of the JSON and full-soup APArticle paths """
+
+    from scrapers import APArticle
+
+    results = {}
+    for path in sorted(glob.glob(pattern)):
+        with open(path) as infile:
+            html = infile.read()
+        for fast in (True, False):
+            with redirect_stdout(io.StringIO()):
+                seconds = timeit.timeit(
+                    lambda: APArticle(path, html=html, fast=fast), number=number
+                )
+            mode = "json" if fast else "soup"
+            results["{} ({})".format(path, mode)] = round(seconds / number, 5)
+
+    return results
+
+
+def bench_sentence_vectors(sentences=50000, dims=300, queries=200):
+
+    """Build and query a SentenceVectors index over random sentence vectors """
+
+    import numpy as np
+    from sentences import SentenceVectors
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((sentences, dims)).astype(np.float32)
+    lemmas = ["lemma{}".format(n % 50) for n in range(sentences)]
+    ids = np.arange(sentences)
+    start = timeit.default_timer()
+    index = SentenceVectors(vectors, ids // 20, ids % 20, lemmas)
+    built = timeit.default_timer() - start
+    rows = rng.integers(sentences, size=queries)
+    noisy = vectors[rows] + 0.3 * rng.standard_normal((queries, dims))
+    start = timeit.default_timer()
+    found = [
+        index.similar(query, k=5, lemma=lemmas[row]) for row, query in zip(rows, noisy)
+    ]
+    seconds = (timeit.default_timer() - start) / queries
+    recall = np.mean([f[0] == (r // 20, r % 20) for r, f in zip(rows, found)])
+
+    return {
+        "sentences": sentences,
+        "build_seconds": round(built, 3),
+        "query_seconds": round(seconds, 6),
+        "recall@1": round(float(recall), 3),
+    }
+
+
+def bench_inflection(lemmas=("run", "go", "take", "announce", "be"), number=20000):
+
+    """Per-call cost of plain lemminflect, cached inflect and irreg_inflect """
+
+    import lemminflect
+    from helpers import inflect, irreg_inflect
+
+    calls = [(lemma, tag) for lemma in lemmas for tag in ("VBD", "VBZ", "VBG")]
+
+    def per_call(func):
+        seconds = timeit.timeit(
+            lambda: [func(lemma, tag) for lemma, tag in calls], number=number // 10
+        )
+        return round(seconds / (number // 10) / len(calls), 8)
+
+    return {
+        "lemminflect_seconds": per_call(lemminflect.getInflection),
+        "inflect_seconds": per_call(inflect),
+        "irreg_inflect_seconds": per_call(lambda *_: irreg_inflect("be", (1, 0, 2))),
+    }
+
+
+def bench_sharded_ingest(stories=200, workers=(1, 2, 4)):
+
+    """Ingest time of a ShardedCatalog by number of workers """
+
+    import types
+    from munger import ShardedCatalog
+
+    with open("fixtures/ap_article.html") as infile:
+        text = re.sub(r"<[^>]+>", " ", infile.read())[:4000]
+    story = types.SimpleNamespace(
+        title=None, byline=None, timestamp=None, content={"text": text}
+    )
+    fake = [story] * stories
+    results = {}
+    for count in workers:
+        start = timeit.default_timer()
+        with redirect_stdout(io.StringIO()), ShardedCatalog(count, fake) as catalog:
+            results["{} workers".format(count)] = round(
+                timeit.default_timer() - start, 3
+            )
+            results["sentences"] = len(catalog.documents.sentence_table)
+
+    return results
+
+
+def bench_replay_crawl(
+    archive="fixtures/crawl", latency=0.05, jitter=0.05, error_rate=0.02, seed=0
+):
+
+    """Offline load_or_refresh_ag crawl against a recorded archive.
+
+    Record the archive first with `python replay.py record fixtures/crawl`.
+    Injected errors are 503s, which httpclient retries with backoff.
+    """
+
+    import os
+    import httpclient
+    from replay import ReplayServer, crawl
+
+    if not os.path.isfile(os.path.join(archive, "index.jsonl")):
+        return "no archive at {}; run replay.py record first".format(archive)
+    server = ReplayServer(
+        archive, latency=latency, jitter=jitter, error_rate=error_rate, seed=seed
+    )
+    start = timeit.default_timer()
+    with redirect_stdout(io.StringIO()), server:
+        agg = crawl()
+    seconds = timeit.default_timer() - start
+    pooled = httpclient.stats().get(server.url, {})
+
+    return {
+        "seconds": round(seconds, 3),
+        "headlines": len(agg.headlines),
+        "stories": len(agg.stories),
+        "connections": pooled.get("connections"),
+        **server.stats(),
+    }
+
+
+def bench_dependency_tree(documents=500, sentences=20, seed=0):
+
+    """Root-child subtree texts of every sentence: token.subtree walks
+    against one DependencyTree, over randomly parsed blank-model Docs
+    """
+
+    import random
+    import spacy
+    from spacy.tokens import Doc
+    from sentences import DependencyTree
+
+    vocab = spacy.blank("en").vocab
+    rng = random.Random(seed)
+
+    def attach(heads, low, high, head):
+        # Random projective tree over tokens low:high, rooted under head
+        if low < high:
+            node = rng.randrange(low, high)
+            heads[node] = node if head is None else head
+            attach(heads, low, node, node)
+            attach(heads, node + 1, high, node)
+
+    docs = []
+    for _ in range(documents):
+        words, heads, starts = [], [], []
+        for _ in range(sentences):
+            size = rng.randint(5, 30)
+            sent = [0] * size
+            attach(sent, 0, size, None)
+            heads += [head + len(words) for head in sent]
+            starts += [True] + [False] * (size - 1)
+            words += ["w{}".format(k) for k in range(size)]
+        deps = [rng.choice(("nsubj", "dobj", "prep", "punct")) for _ in words]
+        docs.append(Doc(vocab, words=words, heads=heads, deps=deps, sent_starts=starts))
+
+    def walk():
+        return [
+            "".join(t.text_with_ws for t in child.subtree)
+            for doc in docs
+            for sent in doc.sents
+            for child in sent.root.children
+        ]
+
+    start = timeit.default_timer()
+    tree = DependencyTree(docs)
+    built = timeit.default_timer() - start
+    start = timeit.default_timer()
+    found = tree.texts(tree.children(tree.roots))
+    arrays = timeit.default_timer() - start
+    start = timeit.default_timer()
+    walked = walk()
+    walking = timeit.default_timer() - start
+
+    return {
+        "tokens": len(tree),
+        "subtrees": len(found),
+        "same": found == walked,
+        "build_seconds": round(built, 3),
+        "array_seconds": round(arrays, 3),
+        "subtree_walk_seconds": round(walking, 3),
+    }
+
+
+HEAVY_PACKAGES = ("selenium", "bs4", "nltk", "google", "spacy", "lemminflect")
+
+
+def bench_import_time(
+    modules=(
+        "helpers",
+        "wikidump",
+        "sentences",
+        "gtts",
+        "scrapers",
+        "munger",
+        "newsbreak",
+    )
+):
+
+    """Cold-start import cost of each entry point, from python -X importtime.
+
+    Reports the cumulative import time of the module and which of the heavy
+    packages it pulled in. Entry points that fail to import (eg. missing
+    models) report the error instead.
+    """
+
+    import subprocess
+
+    results = {}
+    for module in modules:
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import " + module],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        loaded = {}
+        for line in proc.stderr.splitlines():
+            fields = line.split("|")
+            if not line.startswith("import time:") or len(fields) != 3:
+                continue
+            name = fields[2].strip()
+            if fields[1].strip().isdigit():
+                loaded[name] = int(fields[1])
+        if proc.returncode:
+            results[module] = proc.stderr.strip().splitlines()[-1]
+            continue
+        results[module] = {
+            "seconds": round(loaded.get(module, 0) / 1e6, 3),
+            "heavy": sorted(p for p in HEAVY_PACKAGES if p in loaded),
+        }
+
+    return results
+
+
+BENCHMARKS = {
+    "normalize_text": bench_normalize_text,
+    "ap_article": bench_ap_article,
+    "sentence_vectors": bench_sentence_vectors,
+    "inflection": bench_inflection,
+    "sharded_ingest": bench_sharded_ingest,
+    "import_time": bench_import_time,
+    "replay_crawl": bench_replay_crawl,
+    "dependency_tree": bench_dependency_tree,
+}
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS.keys():
+        print("{}: {}".format(name, BENCHMARKS[name]()))
@@ -3,12 +3,33 @@
 
 """Robot voices from google text to speech api """
 
-from google.cloud import texttospeech as tts
+import os
+import re
+import json
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+CACHE_DIR = "tmp/tts"
+REQUEST_LIMIT = 5000  # bytes of input text per synthesize_speech request
+SENTENCE_END = re.compile(r"(?:(?<=[.!?])|(?<=[.!?][\"”’')\]]))\s+")
+
+
+def texttospeech():
+
+    """The google.cloud.texttospeech module, imported on first use """
+
+    # pylint: disable=import-outside-toplevel
+    # Splitting text or reading cached audio doesn't need google-cloud
+    from google.cloud import texttospeech as tts
+
+    return tts
 
 
 def list_voices(language_code=None):
 
     """Retrieve a list of available voices. """
+    tts = texttospeech()
     client = tts.TextToSpeechClient()
     response = client.list_voices(language_code=language_code)
     voices = sorted(response.voices, key=lambda voice: voice.name)
@@ -24,21 +45,242 @@ def list_voices(language_code=None):
         )
 
 
-def text_to_mp3(voice_name, text):
+def voice_params(voice_name):
+
+    """Voice selection for a voice name such as 'en-US-Wavenet-D' """
 
-    """Read out the given text in the given voice and write it to a file. """
+    tts = texttospeech()
     language_code = "-".join(voice_name.split("-")[:2])
-    text_input = tts.SynthesisInput(text=text)
-    voice_params = tts.VoiceSelectionParams(
-        language_code=language_code, name=voice_name
-    )
-    audio_config = tts.AudioConfig(audio_encoding=tts.AudioEncoding.MP3)
-    client = tts.TextToSpeechClient()
-    response = client.synthesize_speech(
-        input=text_input, voice=voice_params, audio_config=audio_config
+
+    return tts.VoiceSelectionParams(language_code=language_code, name=voice_name)
+
+
+def mp3_config():
+
+    """Default audio config: MP3 encoding """
+
+    tts = texttospeech()
+
+    return tts.AudioConfig(audio_encoding=tts.AudioEncoding.MP3)
+
+
+def config_key(audio_config=None):
+
+    """Plain fields identifying an audio config; None is the default MP3 """
+
+    if audio_config is None:
+        return {"audio_encoding": "MP3"}
+
+    return json.loads(type(audio_config).to_json(audio_config))
+
+
+def cache_path(voice_name, text, audio_config=None, cache_dir=CACHE_DIR):
+
+    """Cache file for the audio of (voice, text, config) """
+
+    key = json.dumps([voice_name, text, config_key(audio_config)], sort_keys=True)
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    return os.path.join(cache_dir, digest[:2], digest + ".mp3")
+
+
+def synthesize(client, voice_name, text, audio_config=None, cache_dir=CACHE_DIR):
+
+    """Synthesize text with the given client unless it is already cached.
+
+    RETURNS: path of the cached audio file
+    """
+
+    path = cache_path(voice_name, text, audio_config, cache_dir)
+    if not os.path.isfile(path):
+        tts = texttospeech()
+        audio_config = audio_config or mp3_config()
+        response = client.synthesize_speech(
+            input=tts.SynthesisInput(text=text),
+            voice=voice_params(voice_name),
+            audio_config=audio_config,
+        )
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A file of its own, so threads writing the same text don't collide
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(path), suffix=".part", delete=False
+        ) as out:
+            out.write(response.audio_content)
+        os.replace(out.name, path)
+
+    return path
+
+
+def synthesize_all(
+    voice_name, texts, client=None, max_workers=4, audio_config=None, cache_dir=CACHE_DIR
+):
+
+    """Yield the cached audio path of each text, in order.
+
+    Each distinct text that isn't cached yet is synthesized once, in
+    parallel; a path is yielded as soon as it, and every one before it, is
+    ready. The client (DEFAULT: a new TextToSpeechClient) is only created
+    when some text is missing from the cache.
+    """
+
+    texts = list(texts)
+    paths = {
+        text: cache_path(voice_name, text, audio_config, cache_dir)
+        for text in dict.fromkeys(texts)
+    }
+    missing = [text for text, path in paths.items() if not os.path.isfile(path)]
+    if not missing:
+        yield from (paths[text] for text in texts)
+        return
+
+    client = client or texttospeech().TextToSpeechClient()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {
+            text: pool.submit(
+                synthesize, client, voice_name, text, audio_config, cache_dir
+            )
+            for text in missing
+        }
+        for text in texts:
+            if text in pending:
+                pending[text].result()
+            yield paths[text]
+
+
+def batch_synthesize(
+    voice_name, texts, client=None, max_workers=4, audio_config=None, cache_dir=CACHE_DIR
+):
+
+    """Read out many texts in one voice, sharing a client and a disk cache.
+
+    ARGS:
+        voice_name (required) eg. 'en-US-Wavenet-D'
+        texts (required) list of strings
+        client (optional) TextToSpeechClient; DEFAULT: a new one, if needed
+        max_workers (optional) concurrent requests; DEFAULT: 4
+
+    RETURNS: list of cached audio file paths, in the order of texts
+    """
+
+    return list(
+        synthesize_all(voice_name, texts, client, max_workers, audio_config, cache_dir)
     )
-    filename = f"{language_code}.mp3"
 
+
+def text_to_mp3(voice_name, text, filename=None, client=None):
+
+    """Read out the given text in the given voice and write it to a file.
+
+    The file defaults to the cached copy, so repeated calls don't overwrite
+    each other's audio.
+    """
+
+    path = next(synthesize_all(voice_name, [text], client))
+    if filename:
+        with open(path, "rb") as cached, open(filename, "wb") as out:
+            out.write(cached.read())
+        path = filename
+    print(f'Audio content written to "{path}"')
+
+    return path
+
+
+def split_text(text, limit=REQUEST_LIMIT):
+
+    """Pack whole sentences into chunks of at most limit utf-8 bytes.
+
+    Sentences that are longer than the limit on their own are split
+    between words, and words that are longer still between characters.
+    """
+
+    chunks = []
+    chunk = ""
+    for sentence in (s for s in SENTENCE_END.split(text) if s.strip()):
+        pieces = [sentence]
+        if len(sentence.encode("utf-8")) > limit:
+            pieces = []
+            for word in (p for w in sentence.split() for p in split_word(w, limit)):
+                if pieces and len((pieces[-1] + " " + word).encode("utf-8")) <= limit:
+                    pieces[-1] += " " + word
+                else:
+                    pieces.append(word)
+        for piece in pieces:
+            joined = "{} {}".format(chunk, piece) if chunk else piece
+            if len(joined.encode("utf-8")) <= limit:
+                chunk = joined
+            else:
+                if chunk:
+                    chunks.append(chunk)
+                chunk = piece
+    if chunk:
+        chunks.append(chunk)
+
+    return chunks
+
+
+def split_word(word, limit):
+
+    """Split a word into parts of at most limit utf-8 bytes, between
+    characters
+    """
+
+    parts = [""]
+    size = 0
+    for char in word:
+        width = len(char.encode("utf-8"))
+        if size + width > limit and parts[-1]:
+            parts.append("")
+            size = 0
+        parts[-1] += char
+        size += width
+
+    return parts
+
+
+def mp3_frames(audio):
+
+    """Strip ID3 tags so MP3 streams can be concatenated """
+
+    if audio[:3] == b"ID3" and len(audio) >= 10:
+        size = 0
+        for byte in audio[6:10]:
+            size = (size << 7) | (byte & 0x7F)
+        audio = audio[10 + size + (10 if audio[5] & 0x10 else 0) :]
+    if audio[-128:-125] == b"TAG":
+        audio = audio[:-128]
+
+    return audio
+
+
+def long_text_to_mp3(
+    voice_name,
+    text,
+    filename,
+    client=None,
+    max_workers=4,
+    limit=REQUEST_LIMIT,
+    cache_dir=CACHE_DIR,
+):
+
+    """Read out text of any length into a single MP3 file.
+
+    The text is split at sentence boundaries into chunks under the request
+    limit, the chunks are synthesized in parallel, and their frames are
+    appended to the file in order as soon as each one (and every chunk
+    before it) is ready, so playback can begin before the last chunk is
+    synthesized.
+
+    RETURNS: filename
+    """
+
+    paths = synthesize_all(
+        voice_name, split_text(text, limit), client, max_workers, None, cache_dir
+    )
     with open(filename, "wb") as out:
-        out.write(response.audio_content)
-        print(f'Audio content written to "{filename}"')
+        for path in paths:
+            with open(path, "rb") as chunk:
+                out.write(mp3_frames(chunk.read()))
+            out.flush()
+    print(f'Audio content written to "{filename}"')
+
+    return filename
@@ -6,7 +6,42 @@
 import os
 import subprocess
 import re
-from collections import deque
+import json
+import pickle
+import functools
+from itertools import cycle
+
+GAZETTEER_CACHE = "tmp/gazetteer.pkl"
+
+LDQUOTE = "\u201c"
+RDQUOTE = "\u201d"
+DOUBLE_QUOTE_PATTERN = re.compile(r'"|\u201c|\u201d|[\'\u2018\u2019]{2}')
+DATELINE_PATTERN = re.compile(r"^([A-Z][A-Z ,][^—]*?— )")
+BOTTOM_PATTERN = re.compile(r"^_+$")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+JSON_DECODER = json.JSONDecoder()
+INFLECTION_CACHE_SIZE = 1 << 15
+VERB_TAGS = ("VB", "VBD", "VBG", "VBN", "VBP", "VBZ")
+
+# Irregular forms by lemma, indexed [tense][number][person]
+IRREGULAR_FORMS = {
+    "be": (
+        (("am", "are", "is"), ("are", "are", "are")),
+        (("was", "were", "was"), ("were", "were", "were")),
+    ),
+    "do": (
+        (("do", "do", "does"), ("do", "do", "do")),
+        (("did", "did", "did"), ("did", "did", "did")),
+    ),
+    "have": (
+        (("have", "have", "has"), ("have", "have", "have")),
+        (("had", "had", "had"), ("had", "had", "had")),
+    ),
+    "say": (
+        (("say", "say", "says"), ("say", "say", "say")),
+        (("said", "said", "said"), ("said", "said", "said")),
+    ),
+}
 
 
 FEMININE_TITLES = (
@@ -146,19 +181,79 @@ PRESIDENTIOSITUDE = (
     "Wastern Civilization's Most Impressive Puppet",
 )
 
+FEMININE_TITLE_SET = frozenset(FEMININE_TITLES)
+MASCULINE_TITLE_SET = frozenset(MASCULINE_TITLES)
+GENERIC_TITLE_SET = frozenset(GENERIC_TITLES)
 
-def kill_firefox():
+_GAZETTEER = {}
 
-    """ Indescriminately kill all running firefox processes """
 
-    process = subprocess.Popen(["ps", "-A"], stdout=subprocess.PIPE)
-    output, error = process.communicate()
-    for line in output.splitlines():
-        if "firefox" in str(line):
-            pid = int(line.split(None, 1)[0])
-            os.kill(pid, 9)
-    if error:
-        print(error)
+def build_name_gazetteer():
+
+    """Map each nltk first name to "Female", "Male" or "Unknown" (both) """
+
+    # pylint: disable=import-outside-toplevel
+    # nltk corpora are only needed when the cached gazetteer is missing
+    from nltk.corpus import names
+
+    female = frozenset(names.words("female.txt"))
+    male = frozenset(names.words("male.txt"))
+    gazetteer = {name: "Female" for name in female - male}
+    gazetteer.update({name: "Male" for name in male - female})
+    gazetteer.update({name: "Unknown" for name in female & male})
+
+    return gazetteer
+
+
+def load_gazetteer(cached=GAZETTEER_CACHE):
+
+    """Return the name and title gazetteer, building and caching it once.
+
+    RETURNS: dict with a "names" dict of first name -> gender, and
+        "feminine", "masculine" and "generic" frozensets of titles
+    """
+
+    if not _GAZETTEER:
+        if os.path.isfile(cached):
+            with open(cached, "rb") as pkl:
+                first_names = pickle.load(pkl)
+        else:
+            first_names = build_name_gazetteer()
+            os.makedirs(os.path.dirname(cached) or ".", exist_ok=True)
+            with open(cached, "wb") as pkl:
+                pickle.dump(first_names, pkl)
+        _GAZETTEER.update(
+            {
+                "names": first_names,
+                "feminine": FEMININE_TITLE_SET,
+                "masculine": MASCULINE_TITLE_SET,
+                "generic": GENERIC_TITLE_SET,
+            }
+        )
+
+    return _GAZETTEER
+
+
+def process_group(pgid):
+
+    """Return {pid: rss in KiB} for the live (not zombie) members of a
+    process group
+    """
+
+    process = subprocess.Popen(
+        ["ps", "-A", "-o", "pid=,pgid=,rss=,stat="], stdout=subprocess.PIPE
+    )
+    output, _ = process.communicate()
+    group = {}
+    for line in output.decode().splitlines():
+        try:
+            pid, group_id, kib, stat = line.split()
+            if int(group_id) == pgid and not stat.startswith("Z"):
+                group[int(pid)] = int(kib)
+        except ValueError:
+            continue
+
+    return group
 
 
 def find_duplicates(my_list):
@@ -182,61 +277,120 @@ def fix_double_quotes(input_string):
 
     """Balance quotation marks using utf-8 curlys """
 
-    lsquote = b"\xe2\x80\x98".decode("utf-8")
-    apos = b"\xe2\x80\x99".decode("utf-8")
-    ldquote = b"\xe2\x80\x9c".decode("utf-8")
-    rdquote = b"\xe2\x80\x9d".decode("utf-8")
-    text = input_string
-    quoted = ""
-    warn = ""
-    pat = r'"|{}|{}|{}'.format(ldquote, rdquote, "['" + lsquote + apos + "]{2}")
-    matches = deque(re.finditer(pat, text))
-    parity = 0
-
-    while matches:
-        # look for pairs from left to right
-        match = matches.popleft()
-        copy, text = text[: match.end()], text[match.end() :]
-        repl = [ldquote, rdquote][parity]
-        copy = re.sub(r"{}".format(match[0]), repl, copy)
-        quoted += copy
-        parity = (parity + 1) % 2
-
-    quoted += text
-
-    if parity:
+    quotes = cycle((LDQUOTE, RDQUOTE))
+    quoted, count = DOUBLE_QUOTE_PATTERN.subn(lambda m: next(quotes), input_string)
+
+    if count % 2:
         warn = "Unmatched double quote"
         print("{}: {}".format(warn, quoted))
-        quoted += rdquote
+        quoted += RDQUOTE
 
     return quoted
 
 
+def normalize_text(text):
+
+    """Prepare scraped article text for parsing in a single pass over its lines.
+
+    Each paragraph has its double quotes balanced and its whitespace
+    collapsed; the leading dateline is removed, and everything from the
+    first line of underscores (byline, ads) onward is dropped.
+
+    RETURNS: tuple of (normalized text, dateline or None)
+    """
+
+    dateline = None
+    lines = []
+    for line in text.splitlines():
+        line = WHITESPACE_PATTERN.sub(" ", line).strip()
+        if BOTTOM_PATTERN.match(line):
+            break
+        match = DATELINE_PATTERN.match(line)
+        if match:
+            if dateline is None:
+                dateline = match[0]
+            line = line[match.end() :]
+        if line:
+            lines.append(fix_double_quotes(line))
+
+    return "\n".join(lines), dateline
+
+
+def embedded_json_field(text, key):
+
+    """Decode the value of the first "key": ... pair embedded in a page.
+
+    RETURNS: the decoded JSON value, or None if the key is missing or its
+        value can't be decoded
+    """
+
+    match = re.search(r'"{}"\s*:\s*'.format(re.escape(key)), text)
+    if not match:
+        return None
+    try:
+        return JSON_DECODER.raw_decode(text, match.end())[0]
+    except ValueError:
+        return None
+
+
 def irreg_inflect(lemma, context):
 
     """ Return the inflected form for the given context: (tense,number,person) """
 
-    itable = {}
-    itable["be"] = [
-        [["am", "are", "is"], ["are", "are", "are"]],
-        [["was", "were", "was"], ["were", "were", "were"]],
-    ]
-    itable["do"] = [
-        [["do", "do", "does"], ["do", "do", "do"]],
-        [["did", "did", "did"], ["did", "did", "did"]],
-    ]
-    itable["have"] = [
-        [["have", "have", "has"], ["have", "have", "have"]],
-        [["had", "had", "had"], ["had", "had", "had"]],
-    ]
-    itable["say"] = [
-        [["say", "say", "says"], ["say", "say", "say"]],
-        [["said", "said", "said"], ["said", "said", "said"]],
-    ]
-
     tense, number, person = context
 
-    return itable[lemma][tense][number][person]
+    return IRREGULAR_FORMS[lemma][tense][number][person]
+
+
+@functools.lru_cache(maxsize=INFLECTION_CACHE_SIZE)
+def inflect(lemma, tag):
+
+    """Inflect a lemma for a Penn Treebank tag; None if lemminflect can't.
+
+    Lookups are shared and LRU-cached on (lemma, tag).
+    """
+
+    # pylint: disable=import-outside-toplevel
+    # lemminflect loads only once something is inflected
+    import lemminflect
+
+    if not tag or not lemma:
+        return None
+    if lemminflect.Lemmatizer.isTagBaseForm(tag):
+        return lemma
+    try:
+        forms = lemminflect.getInflection(lemma, tag)
+    except (KeyError, IndexError):
+        forms = ()
+
+    return forms[0] if forms else None
+
+
+def inflect_token(token, tag):
+
+    """Cached stand-in for token._.inflect(tag), keyed on the token's lemma.
+
+    Keeps the token's capitalization, and falls back to its text.
+    """
+
+    form = inflect(token.lemma_.lower(), tag)
+    if form is None:
+        return token.text
+    if token.text.isupper() and len(token.text) > 1:
+        return form.upper()
+    if token.text[:1].isupper():
+        return form[:1].upper() + form[1:]
+
+    return form
+
+
+def prime_inflections(lemmas, tags=VERB_TAGS):
+
+    """Fill the inflection cache for lemmas, eg. a catalog's root lemmas """
+
+    for lemma in lemmas:
+        for tag in tags:
+            inflect(lemma.lower(), tag)
 
 
 # if __name__ == "__main__":
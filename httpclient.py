@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" One pooled, keep-alive HTTP client shared by all the scrapers.
+
+Every thread gets its own requests.Session (sessions keep cookies and are
+not thread-safe), but all of them mount the same HTTPAdapter, so they
+share its per-host urllib3 connection pools: a run's hundreds of lookups
+reuse a handful of TCP/TLS connections. Requests get a default timeout,
+retries with backoff on connection errors and 429/5xx answers, and
+negotiate gzip (and brotli, when a brotli package is installed).
+
+    from httpclient import get
+    response = get("https://apnews.com/")
+
+Responses can also be recorded to, and requests routed to, a replay.py
+archive and server, so crawls can be run offline.
+"""
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+TIMEOUT = (5, 30)  # seconds to connect, seconds between bytes read
+POOL_HOSTS = 16  # hosts with a pool of their own
+POOL_SIZE = 8  # kept-alive connections per host
+DRAIN_LIMIT = 16 << 10  # bytes left on the wire worth reading to save a connection
+
+RETRY = Retry(
+    total=3,
+    read=2,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["GET", "HEAD"]),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+_ADAPTER = None
+_LOCK = threading.Lock()
+_LOCAL = threading.local()
+_ROUTE = None  # base url of a replay server that takes every request
+_RECORDER = None  # replay.Archive that keeps every response
+
+
+def accept_encoding():
+
+    """Content codings this process can decode, best first """
+
+    try:
+        # pylint: disable=import-outside-toplevel,unused-import
+        # urllib3 decodes br whenever either package can be imported
+        import brotli
+    except ImportError:
+        try:
+            # pylint: disable=import-outside-toplevel,unused-import
+            import brotlicffi
+        except ImportError:
+            return "gzip, deflate"
+
+    return "br, gzip, deflate"
+
+
+def adapter():
+
+    """The process-wide pooled HTTPAdapter """
+
+    global _ADAPTER  # pylint: disable=global-statement
+    with _LOCK:
+        if _ADAPTER is None:
+            _ADAPTER = HTTPAdapter(
+                pool_connections=POOL_HOSTS, pool_maxsize=POOL_SIZE, max_retries=RETRY
+            )
+
+    return _ADAPTER
+
+
+def session():
+
+    """This thread's Session, mounted on the shared adapter """
+
+    if getattr(_LOCAL, "session", None) is None:
+        _LOCAL.session = requests.Session()
+        _LOCAL.session.headers["Accept-Encoding"] = accept_encoding()
+        for prefix in ("http://", "https://"):
+            _LOCAL.session.mount(prefix, adapter())
+
+    return _LOCAL.session
+
+
+def get(url, **kwargs):
+
+    """requests.get through the shared pools, with the default timeout """
+
+    kwargs.setdefault("timeout", TIMEOUT)
+    if _ROUTE is None:
+        response = session().get(url, **kwargs)
+    else:
+        response = session().get("{}/{}".format(_ROUTE, url), **kwargs)
+    if _RECORDER is not None:
+        # Reading the whole body here still lets streaming callers iterate it
+        _RECORDER.add(url, response.status_code, response.headers, response.content)
+
+    return response
+
+
+def route(base_url=None):
+
+    """Send every request to base_url/<original url> (a replay.ReplayServer);
+    None goes back to the network
+    """
+
+    global _ROUTE  # pylint: disable=global-statement
+    _ROUTE = base_url.rstrip("/") if base_url else None
+
+
+def record(archive=None):
+
+    """Add every response to archive (a replay.Archive); None stops recording """
+
+    global _RECORDER  # pylint: disable=global-statement
+    _RECORDER = archive
+
+
+def release(response, limit=DRAIN_LIMIT):
+
+    """Finish with a streamed response.
+
+    When Content-Length shows no more than limit bytes left on the wire,
+    they are read so the connection can go back to the pool; otherwise
+    (or without a Content-Length) the connection is dropped, as
+    response.close() alone would.
+
+    RETURNS: the number of bytes read to save the connection
+    """
+
+    drained = 0
+    try:
+        remaining = int(response.headers["Content-Length"]) - response.raw.tell()
+        if 0 < remaining <= limit:
+            for chunk in response.raw.stream(16384, decode_content=False):
+                drained += len(chunk)
+    except (requests.RequestException, OSError, LookupError, ValueError, RuntimeError):
+        pass
+    response.close()
+
+    return drained
+
+
+def stats():
+
+    """Connections opened and requests sent, per pooled host """
+
+    pools = adapter().poolmanager.pools
+
+    return {
+        "{}://{}:{}".format(*key[:3]): {
+            "connections": pool.num_connections,
+            "requests": pool.num_requests,
+        }
+        for key, pool in ((k, pools[k]) for k in list(pools.keys()))
+    }
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Counters, gauges and histograms for long-running scrape and munge jobs.
+
+Metrics are registered once, at import, in the process-wide REGISTRY:
+
+    FETCHED = metrics.counter("articles_fetched_total", "AP articles", ["topic"])
+    FETCHED.inc(topic="Sports")
+
+and exported in the Prometheus text format, from a local endpoint
+(serve, or newsbreak's /metrics) or to a file at exit (dump_at_exit).
+Values are per process; shard workers keep their own.
+"""
+
+import os
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; from a cached lookup to a slow page load
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format(value):
+
+    """A sample value as Prometheus writes it """
+
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+
+    return repr(float(value))
+
+
+def _escape(value):
+
+    """A label value escaped for the text format """
+
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+class Metric:
+
+    """Base class: one value per combination of label values """
+
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+
+        """ARGS: name, documentation (the HELP line), labelnames """
+
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+
+        """Label values in labelnames order; raises ValueError if any differ """
+
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                "{} takes labels {}, got {}".format(
+                    self.name, self.labelnames, tuple(labels)
+                )
+            )
+
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, **extra):
+
+        """Render a {name="value",...} label set, or nothing """
+
+        pairs = list(zip(self.labelnames, key)) + list(extra.items())
+        if not pairs:
+            return ""
+
+        return "{" + ",".join('{}="{}"'.format(n, _escape(v)) for n, v in pairs) + "}"
+
+    def get(self, **labels):
+
+        """Current value for the label values """
+
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+
+        """Yield (name, labels, value) for each exported sample """
+
+        for key, value in sorted(self._values.items()):
+            yield self.name, self._labels(key), value
+
+    def render(self):
+
+        """The metric in the Prometheus text format """
+
+        lines = [
+            "# HELP {} {}".format(self.name, self.documentation),
+            "# TYPE {} {}".format(self.name, self.kind),
+        ]
+        lines += [
+            "{}{} {}".format(name, labels, _format(value))
+            for name, labels, value in self.samples()
+        ]
+
+        return "\n".join(lines) + "\n"
+
+    def __repr__(self):
+        return "<{} {}: {} series>".format(
+            type(self).__name__, self.name, len(self._values)
+        )
+
+
+class Counter(Metric):
+
+    """A value that only goes up """
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+
+        """Add amount (>= 0) """
+
+        if amount < 0:
+            raise ValueError("{} can only go up".format(self.name))
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+
+    """A value that goes up and down, or is read when exported """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._functions = {}
+
+    def set(self, value, **labels):
+
+        """Set the value """
+
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function, **labels):
+
+        """Read the value from function() whenever it is exported """
+
+        self._functions[self._key(labels)] = function
+
+    def get(self, **labels):
+        key = self._key(labels)
+        if key in self._functions:
+            return self._functions[key]()
+        return self._values.get(key, 0)
+
+    def samples(self):
+        values = dict(self._values)
+        for key, function in list(self._functions.items()):
+            values[key] = function()
+        for key, value in sorted(values.items()):
+            yield self.name, self._labels(key), value
+
+
+class Histogram(Metric):
+
+    """Observations counted into cumulative buckets, with their sum """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=BUCKETS):
+
+        """ARGS: name, documentation, labelnames, buckets (upper bounds) """
+
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+
+        """Count one observation """
+
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+
+        """Observe the seconds spent in a with block """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def get(self, **labels):
+
+        """RETURNS: (observations, sum) for the label values """
+
+        counts, total = self._values.get(self._key(labels), ((), 0.0))
+
+        return sum(counts), total
+
+    def samples(self):
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = self._labels(key, le=_format(bound))
+                yield self.name + "_bucket", labels, cumulative
+            yield self.name + "_sum", self._labels(key), total
+            yield self.name + "_count", self._labels(key), cumulative
+
+
+class Registry:
+
+    """Named metrics, exported together """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+
+        """Add metric; RETURNS the metric already registered under its name,
+        if there is one of the same type, so modules can be reloaded
+        """
+
+        with self._lock:
+            known = self._metrics.get(metric.name)
+            if known is None:
+                self._metrics[metric.name] = metric
+                return metric
+        if type(known) is not type(metric) or known.labelnames != metric.labelnames:
+            raise ValueError("{} is already registered".format(metric.name))
+
+        return known
+
+    def get(self, name):
+
+        """The metric registered as name, or None """
+
+        return self._metrics.get(name)
+
+    def render(self):
+
+        """Every metric in the Prometheus text format """
+
+        return "".join(m.render() for _, m in sorted(self._metrics.items()))
+
+    def dump(self, path):
+
+        """Write render() to path, replacing it atomically """
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path + ".tmp", "w") as outfile:
+            outfile.write(self.render())
+        os.replace(path + ".tmp", path)
+
+    def __repr__(self):
+        return "<Registry: {}>".format(" ".join(sorted(self._metrics)))
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+
+    """Register a Counter in REGISTRY """
+
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=()):
+
+    """Register a Gauge in REGISTRY """
+
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=BUCKETS):
+
+    """Register a Histogram in REGISTRY """
+
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def dump_at_exit(path, registry=REGISTRY):
+
+    """Write the metrics to path when the process exits """
+
+    atexit.register(registry.dump, path)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    """Serve REGISTRY as Prometheus text at /metrics """
+
+    registry = REGISTRY
+
+    # pylint: disable=invalid-name
+    # BaseHTTPRequestHandler dispatches on these names
+
+    def do_GET(self):
+
+        """Serve /metrics """
+
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(address=("127.0.0.1", 9642)):
+
+    """Serve /metrics from a background thread; RETURNS the server """
+
+    server = ThreadingHTTPServer(address, MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
@@ -11,43 +11,242 @@ import re
 import random
 import datetime
 import time
-import string
 import pickle
-from collections import deque
+import shelve
+import hashlib
+import functools
+import multiprocessing
+from collections import deque, OrderedDict
+from collections.abc import Sequence
 from itertools import islice
+import numpy as np
 import spacy
-import lemminflect
-from nltk.corpus import names, verbnet
-from spacy.tokens import Doc
+from spacy.language import Language
+from spacy.tokens import Doc, DocBin
 from spacy.matcher import Matcher
 from scrapers import Aggregator
-from scrapers import WikiPerson, WikiOrg, WikiGPE
-from helpers import find_duplicates, irreg_inflect
-from helpers import GENERIC_TITLES, FEMININE_TITLES, MASCULINE_TITLES
+from scrapers import WikiPerson, WikiOrg, WikiGPE, WikiLead
+import metrics
+from helpers import irreg_inflect, inflect_token, prime_inflections
+from helpers import load_gazetteer, normalize_text
+from sentences import SentenceTable, SentenceVectors, DependencyTree, sentence_matrix
+from sentences import quote_spans, requote
+
+WIKI_INDEX = "tmp/wiki"
 
 print("\nLoading spaCy English vocabulary with medium word vectors . . .")
 nlp = spacy.load("en_core_web_md")
 print("Done.\n")
 
+NLP_DOCS = metrics.counter("nlp_docs_total", "Texts parsed by nlp()")
+NLP_TOKENS = metrics.counter("nlp_tokens_total", "Tokens parsed by nlp()")
+MUNGES = metrics.counter(
+    "munges_total", "Munger strategy calls, by cache outcome", ["strategy", "cache"]
+)
+ENTITIES = metrics.counter(
+    "scanner_entities_total", "Named entities found by the Scanners", ["label"]
+)
+CATALOG_BYTES = metrics.gauge(
+    "catalog_bytes",
+    "Catalog memory: serialized Docs held, and sentence index arrays",
+    ["part"],
+)
+
+
+@Language.component("count_parses")
+def count_parses(doc):
+
+    """First pipeline component: count every nlp() call and its tokens """
+
+    NLP_DOCS.inc()
+    NLP_TOKENS.inc(len(doc))
+
+    return doc
+
+
+nlp.add_pipe("count_parses", first=True)
+
 
 # Classes
 
 
+class MungeCache:
+
+    """Bounded LRU memo of munge results, with an optional on-disk tier.
+
+    Keys are (catalog fingerprint, strategy, similar_k, source (doc, sent) ids,
+    extra args, variant seed). Each cached call picks one of `variants`
+    seeds from the caller's RNG, so repeated builds reuse earlier work
+    while still drawing from several different munges per sentence.
+    """
+
+    def __init__(self, maxsize=4096, path=None, variants=4):
+
+        """ARGS: maxsize (in-memory entries), path (shelve file for the disk
+        tier; DEFAULT: None), variants (munges kept per input)
+        """
+
+        self.maxsize = maxsize
+        self.variants = variants
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memo = OrderedDict()
+        self._disk = shelve.open(path) if path else None
+        register_doc_extensions()
+
+    def get(self, key):
+
+        """Return a cached sentence tuple, or None """
+
+        if key in self._memo:
+            self._memo.move_to_end(key)
+            self.hits += 1
+            return self._memo[key]
+        if self._disk is not None and repr(key) in self._disk:
+            lemma, doc_bytes, *sources = self._disk[repr(key)]
+            sent = Doc(nlp.vocab).from_bytes(doc_bytes)[:]
+            sent.doc._.sources = sources[0] if sources else None
+            self._remember(key, (None, None, lemma, sent))
+            self.disk_hits += 1
+            return self._memo[key]
+        self.misses += 1
+
+        return None
+
+    def put(self, key, sentence):
+
+        """Cache a munged sentence tuple """
+
+        self._remember(key, sentence)
+        if self._disk is not None:
+            self._disk[repr(key)] = (
+                sentence[2],
+                sentence[-1].as_doc().to_bytes(),
+                sentence_sources(sentence),
+            )
+
+    def _remember(self, key, sentence):
+
+        """Add to the in-memory tier, evicting the least recently used """
+
+        self._memo[key] = sentence
+        self._memo.move_to_end(key)
+        while len(self._memo) > self.maxsize:
+            self._memo.popitem(last=False)
+
+    def stats(self):
+
+        """Hit counts and ratio """
+
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "size": len(self._memo),
+        }
+
+    def close(self):
+
+        """Close the disk tier """
+
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+    def __repr__(self):
+        return "<MungeCache: {}>".format(self.stats())
+
+
+def memoized(strategy):
+
+    """Memoize a Munger method on its source sentence ids.
+
+    Calls on sentences without (doc, sent) ids, or on a Munger without a
+    cache, go straight through. Cached calls run under an RNG seeded from
+    their key, and the caller's RNG state is restored afterwards, so a
+    seeded build produces the same corpse whether or not it hits the cache.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = self.munge_cache
+            if cache is None or not args or args[0] is None:
+                MUNGES.inc(strategy=strategy, cache="none")
+                return method(self, *args, **kwargs)
+            try:
+                key = (
+                    self.fingerprint,
+                    strategy,
+                    self.similar_k,
+                    tuple(munge_key_part(arg) for arg in args),
+                    tuple(sorted((k, munge_key_part(v)) for k, v in kwargs.items())),
+                )
+                hash(key)
+            except (TypeError, ValueError):
+                MUNGES.inc(strategy=strategy, cache="none")
+                return method(self, *args, **kwargs)
+
+            key += (random.randrange(cache.variants),)
+            cached = cache.get(key)
+            MUNGES.inc(strategy=strategy, cache="hit" if cached else "miss")
+            if cached:
+                return cached
+            state = random.getstate()
+            random.seed(repr(key))
+            try:
+                result = method(self, *args, **kwargs)
+            finally:
+                random.setstate(state)
+            if result:
+                cache.put(key, result)
+
+            return result
+
+        return wrapper
+
+    return decorator
+
+
 class Munger:
 
     """
     Base class for MadLib, ExquisiteCorpse, or other fake news generators.
     """
 
-    def __init__(self, documents):
+    def __init__(self, documents, cache=None, similar_k=None):
 
         """
         Declare headline, document, sentence and sub_sentences attrbutes;
-        generate a list of repeated sentence roots
+        generate a list of repeated sentence roots and a sentence vector index
+
+        ARGS:
+            cache (optional) a MungeCache to memoize munges in
+            similar_k (optional) munge_on_roots picks its partner sentence
+                from the k most similar sentences sharing a root;
+                DEFAULT: any sentence sharing the root
         """
 
+        register_doc_extensions()
         self._headline = None
         self._documents = documents
+        self.munge_cache = cache
+        self.fingerprint = catalog_fingerprint(documents)
+        self.similar_k = similar_k
+        # A RollingDocuments sequence brings its merged indexes along
+        self.sentence_table = getattr(documents, "sentence_table", None)
+        if self.sentence_table is None:
+            self.sentence_table = SentenceTable(documents)
+        self.sentence_vectors = getattr(documents, "sentence_vectors", None)
+        if self.sentence_vectors is None:
+            self.sentence_vectors = SentenceVectors.from_documents(documents)
+        self.dependency_tree = getattr(documents, "dependency_tree", None)
+        if self.dependency_tree is None and not hasattr(documents, "subtrees"):
+            self.dependency_tree = DependencyTree(documents)
+        prime_inflections(self.sentence_table.lemmas)
         self._sentences = self.find_mungeable_sentences()
         self._sub_sentencess = []
         self._popular_roots = sorted(
@@ -64,21 +263,19 @@ class Munger:
 
     def fetch_subtrees(self, lemma):
 
-        """Create a dict of left and right hand children for a given root. """
+        """Create a dict of left and right hand children for a given root:
+        {"left": {dep: [(doc, sent, subtree text), ...]}, "right": {...}}
+        """
 
         # pylint: disable=invalid-name
         # Will change when refactoring
 
-        subtrees = {"left": dict(), "right": dict()}
         alternatives = []
         if lemma not in self._sentences.keys():
             # check verbnet
-            vnids = verbnet.classids(lemma)
-            alternatives = []
-            for vnid in vnids:
-                for lem in verbnet.lemmas(vnid):
-                    if lem in self._popular_roots:
-                        alternatives.append(lem)
+            alternatives = [
+                lem for lem in verbnet_lemmas(lemma) if lem in self._popular_roots
+            ]
             if not alternatives:
                 alternatives = self._popular_roots
 
@@ -90,52 +287,43 @@ class Munger:
                 reverse=True,
             )[0][0]
 
-        for i, j in self._sentences[lemma]:
-            s = next(islice(self._documents[i].sents, j, None))
-            for left in s.root.lefts:
-                k = left.dep_
-                if k in subtrees["left"].keys():
-                    subtrees["left"][k].append((i, j, [t for t in left.subtree]))
-                elif k != "punct":
-                    subtrees["left"][k] = [(i, j, [t for t in left.subtree])]
-            for right in s.root.rights:
-                k = right.dep_
-                if k in subtrees["right"].keys():
-                    subtrees["right"][k].append((i, j, [t for t in right.subtree]))
-                elif k != "punct":
-                    subtrees["right"][k] = [(i, j, [t for t in right.subtree])]
+        pairs = self._sentences[lemma]
+        if hasattr(self._documents, "subtrees"):
+            # Sharded documents gather subtrees from their workers
+            return self._documents.subtrees(pairs)
 
-        return subtrees
+        return collect_subtrees(self._documents, pairs, self.dependency_tree)
 
+    @memoized("roots")
     def munge_on_roots(self, sentence_a=None, sentence_b=None):
 
         """
         Join left hand side of sentence a with the right hand side of senence b,
         or with a randomly chosen sentence with a similar root lemma.
+        Sayings and quoted sentences are passed over for a random pairable
+        pair from the SentenceTable.
         """
 
         # pylint: disable=invalid-name
         # Will change when refactoring
 
-        if sentence_a:
-            s1 = sentence_a
-            if sentence_b:
-                s2 = sentence_b
-            else:
-                s2 = self.picka_sentence(lemma=s1[2], exclude=[(s1[0], s1[1])])
-        else:
-            s1 = self.picka_sentence()
-            s2 = self.picka_sentence(lemma=s1[2], exclude=[(s1[0], s1[1])])
-
-        for s in [s1, s2]:
-            if s[-1].root.lemma_ == "say" or [t for t in s[3] if t.is_quote]:
-                return self.munge_on_roots()
+        s1, s2 = sentence_a, sentence_b
+        if not all(self.root_mungeable(s) for s in [s1, s2] if s):
+            s1 = s2 = None
+        if s1 and not s2:
+            s2 = self.pick_partner(s1)
+        if not (s1 and s2):
+            row = self.sentence_table.pick(self.sentence_table.pairable)
+            if row is None:
+                return sentence_a or self.picka_sentence()
+            s1 = self.sentence_at(row)
+            s2 = self.pick_partner(s1)
 
         lefts = []
         rights = []
-        root_text = "{} ".format(s2[-1].root._.inflect(s1[-1].root.tag_))
+        root_text = "{} ".format(inflect_token(s2[-1].root, s1[-1].root.tag_))
         for left in s1[-1].root.lefts:
-            lefts.append("".join([t.text_with_ws for t in left.subtree]))
+            lefts.append(subtree_span(left).text_with_ws)
         for right in s2[-1].root.rights:
             rights.append(
                 "".join(
@@ -143,9 +331,9 @@ class Munger:
                         t.text_with_ws
                         if t.dep_ != "conj"
                         else re.sub(
-                            r"\S+", t._.inflect(s1[-1].root.tag_), t.text_with_ws
+                            r"\S+", inflect_token(t, s1[-1].root.tag_), t.text_with_ws
                         )
-                        for t in right.subtree
+                        for t in subtree_span(right)
                     ]
                 )
             )
@@ -158,91 +346,78 @@ class Munger:
                 None,
             )
         )
+        munged.doc._.sources = sentence_sources(s1, s2)
+
         return (None, None, munged.root.lemma_, munged)
 
+    def quote_spans(self, sentence):
+
+        """Quote spans of a sentence tuple, from the SentenceTable if it has
+        ids; see sentences.quote_spans
+        """
+
+        if sentence[0] is not None:
+            row = self.sentence_table.row(sentence[0], sentence[1])
+            return [tuple(span) for span in self.sentence_table.quotes(row).tolist()]
+
+        return quote_spans(sentence[-1])
+
     def extract_quoted(self, sentence):
 
         """
         Extract quoted elements and return a list of sentence tuples
         """
 
-        # pylint: disable=invalid-name
-        # Will change when refactoring
-
         s = sentence[-1]
-        hasq = deque([t for t in s if t.orth_ in ["“", "”"]])
-        if len(hasq) % 2:
-            sent = balance_quotes(sentence)
-            return self.extract_quoted(sent)
-        parts = []
-        while hasq:
-            lq = hasq.popleft()
-            rq = hasq.popleft()
-            start = lq.i - s.start + 1
-            end = rq.i - s.start
-            part = "".join([t.text_with_ws for t in s[start:end]])
-            parts.append(part)
-
-        text = re.sub(r"\s+", " ", " ".join(parts))
-        sub_sents = [(None, None, ss.root.lemma_, ss) for ss in nlp(text).sents]
+        parts = [
+            "".join(t.text_with_ws for t in s[left + 1 : right])
+            for left, right, *_ in self.quote_spans(sentence)
+        ]
+        text = re.sub(r"\s+", " ", " ".join(parts)).strip()
+        doc = nlp(text)
+        doc._.sources = sentence_sources(sentence)
+        sub_sents = [(None, None, ss.root.lemma_, ss) for ss in doc.sents]
 
         return sub_sents
 
+    @memoized("quotes")
     def swap_quotes(self, sentence):
 
-        """Insert randomly root-munged sentences in place of quotations """
+        """Insert randomly root-munged sentences in place of quotations.
 
-        # pylint: disable=invalid-name
-        # Will change when refactoring
+        The last quotation takes whatever munges are left; earlier ones take
+        one each while there are enough to go round, otherwise the first
+        clause of the next munge.
+        """
 
-        s = sentence
-        hasq = deque([t for t in s[-1] if t.orth_ in ["“", "”"]])
-        swaps = None
-        if hasq:
-            if len(hasq) % 2:
-                s = balance_quotes(s)
-                return self.swap_quotes(s)
-            sub_sents = self.extract_quoted(s)
-            swaps = []
-            for ss in sub_sents:
-                swaps.append(self.munge_on_roots(ss))
-            text = ""
-            ri = -1
-            while hasq:
-                left = hasq.popleft()
-                right = hasq.popleft()
-                li = left.i - s[-1].start + 1
-                ri = right.i - s[-1].start
-                parts = []
-                if len(hasq) == 0:
-                    for swap in swaps:
-                        parts.extend(ss.text_with_ws for ss in swap[-1])
-                    repl = re.sub(r"[\s\n]+", " ", " ".join(parts), flags=re.MULTILINE)
-                elif len(swaps) == len(hasq) / 2:
-                    repl = re.sub(
-                        r"\n", "", swaps[0][-1].text_with_ws, flags=re.MULTILINE
-                    )
-                    del swaps[0]
+        spans = self.quote_spans(sentence)
+        if not spans:
+            return sentence
+        munged = [self.munge_on_roots(ss) for ss in self.extract_quoted(sentence)]
+        swaps = [m[-1] for m in munged]
+        texts = []
+        for k in range(len(spans)):
+            remaining = len(spans) - k
+            if not swaps:
+                texts.append(None)
+                continue
+            if remaining == 1:
+                repl = " ".join(swap.text for swap in swaps)
+            elif len(swaps) >= remaining:
+                repl = swaps.pop(0).text
+            else:
+                commas = [t.i - swaps[0].start for t in swaps[0] if t.orth_ == ","]
+                if commas:
+                    repl = swaps[0][: commas[0] + 1].text
+                    swaps[0] = swaps[0][commas[0] + 1 :]
                 else:
-                    try:
-                        # pylint: disable=bare-except
-                        # Too many ways this can break to list them all
-                        spl = [
-                            t.i - swaps[0].start for t in swaps[0] if t.orth_ == ","
-                        ][0]
-                        repl, swaps[0] = swaps[0][:spl], swaps[0][spl:]
-                    except:
-                        repl = "Just kidding,"
-
-                text += "".join([t.text_with_ws for t in s[-1]][:li])
-                text += repl
+                    repl = "Just kidding,"
+            texts.append(re.sub(r"\s+", " ", repl).strip())
 
-            text += "".join([t.text_with_ws for t in s[-1]][ri:])
+        new_sent = next(islice(nlp(requote(sentence[-1], spans, texts)).sents, 0, None))
+        new_sent.doc._.sources = sentence_sources(sentence, *munged)
 
-            new_sent = next(islice(nlp(text).sents, 0, None))
-            sentence = (None, None, new_sent.root.lemma_, new_sent)
-
-        return sentence
+        return (None, None, new_sent.root.lemma_, new_sent)
 
     def munge_sayings(self, sentence_a, sentence_b=None):
 
@@ -250,22 +425,14 @@ class Munger:
         Munge 'say' sentence by swapping quotiations or by munging children
         """
 
-        # pylint: disable=invalid-name
-        # Will change when refactoring
-
-        sentences = [sentence_a, sentence_b]
-        for s in sentences:
+        for s in [sentence_a, sentence_b]:
             if s:
-                hasq = deque([t for t in s[-1] if t.orth_ in ["“", "”"]])
-                if hasq:
-                    if len(hasq) % 2:
-                        s = balance_quotes(s)
-                        return self.munge_sayings(s)
+                if self.quote_spans(s):
                     return self.swap_quotes(s)
 
                 return self.munge_children(s)
 
-        return sentences[0]
+        return sentence_a
 
     def munge_beings(self, sentence):
 
@@ -277,6 +444,7 @@ class Munger:
 
         return sentence
 
+    @memoized("children")
     def munge_children(self, sentence, *args, **kwargs):
 
         """Sequentially replace subtree of each child of root """
@@ -301,6 +469,7 @@ class Munger:
 
         subtrees = self.fetch_subtrees(lemma)
         elements = []
+        sources = sentence_sources(sentence)
         cursor = 0
 
         for hand in workon:
@@ -316,9 +485,8 @@ class Munger:
                 cursor = s.root.i - s.start + 1
 
             for child in (c for c in nodes if c.dep_ in keys and c.dep != "punct"):
-                tree = [t for t in child.subtree]
-                li = tree[0].i - s.start
-                ri = tree[-1].i - s.start
+                li = child.left_edge.i - s.start
+                ri = child.right_edge.i - s.start
                 elements.extend([t.text_with_ws for t in s][cursor:li])
                 choices = [
                     stree
@@ -333,7 +501,8 @@ class Munger:
                         )
                         infl_tag = infl_cntx.root.tag_
 
-                    elements.extend([t.text_with_ws for t in r[-1]])
+                    elements.append(r[-1])
+                    sources.append((r[0], r[1]))
                     cursor = ri + 1
                 except IndexError:
                     pass
@@ -359,11 +528,11 @@ class Munger:
                                 p = 0
                                 n = 1
 
-                        if "conj" in [c.dep_ for c in subj[0].subtree]:
+                        if "conj" in [c.dep_ for c in subtree_span(subj[0])]:
                             n = 1
 
                     if infl_tag == "VBG":
-                        repl = s.root._.inflect("VBG")
+                        repl = inflect_token(s.root, "VBG")
                     else:
                         if infl_tag == "VBD":
                             t = 1
@@ -373,20 +542,25 @@ class Munger:
                 else:
                     re.sub(
                         r"{}".format(s.root.orth_),
-                        s.root._.inflect(infl_tag),
+                        inflect_token(s.root, infl_tag),
                         elements[-1],
                     )
 
                 cursor += 1
 
         elements.extend(t.text_with_ws for t in s[cursor:])
+        munged = sent_from_wordlist(elements)
+        munged[-1].doc._.sources = list(dict.fromkeys(sources))
 
-        return sent_from_wordlist(elements)
+        return munged
 
     def picka_sentence(self, doc_id=None, **kwargs):
 
         """
         Choose a compatible sentence, or a random one.
+
+        Given a lemma and similar_to (a sentence tuple), choose among the k
+        (DEFAULT: 5) sentences sharing that root whose vectors are closest.
         """
 
         if doc_id:
@@ -404,19 +578,25 @@ class Munger:
         if "lemma" in kwargs.keys():
             lemma = kwargs["lemma"]
             if lemma in self._popular_roots:
-                s_list = list(set(self._sentences[lemma]) - set(exclude))
+                if "similar_to" in kwargs.keys():
+                    s_list = self.sentence_vectors.similar(
+                        kwargs["similar_to"][-1].vector,
+                        k=kwargs.get("k", 5),
+                        lemma=lemma,
+                        exclude=exclude,
+                    )
+                else:
+                    s_list = list(set(self._sentences[lemma]) - set(exclude))
                 if s_list:
                     random.shuffle(s_list)
                     d_index, s_index = s_list[0]
                     sent = next(islice(self._documents[d_index].sents, s_index, None))
                     return (d_index, s_index, lemma, sent)
                 # check verbnet
-                vnids = verbnet.classids(lemma)
                 alternatives = []
-                for vnid in vnids:
-                    for lem in verbnet.lemmas(vnid):
-                        if lem in self._popular_roots:
-                            alternatives.extend(self._sentences[lem])
+                for lem in verbnet_lemmas(lemma):
+                    if lem in self._popular_roots:
+                        alternatives.extend(self._sentences[lem])
                 if alternatives:
                     # use these to continue
                     d_index, s_index = alternatives[random.randrange(len(alternatives))]
@@ -445,21 +625,58 @@ class Munger:
 
         return (d_index, s_index, lemma, sent)
 
+    def sentence_at(self, row):
+
+        """Sentence tuple for a SentenceTable row """
+
+        table = self.sentence_table
+        d_index, s_index = table.ids(row)
+        sent = self._documents[d_index][table.starts[row] : table.ends[row]]
+
+        return (d_index, s_index, table.lemmas[table.lemma_ids[row]], sent)
+
+    def root_mungeable(self, sentence):
+
+        """True unless sentence is a saying or holds quotes """
+
+        if sentence[0] is not None:
+            table = self.sentence_table
+            return bool(table.eligible[table.row(sentence[0], sentence[1])])
+
+        return sentence[-1].root.lemma_ != "say" and not any(
+            t.is_quote for t in sentence[-1]
+        )
+
+    def pick_partner(self, sentence):
+
+        """Pick an eligible sentence sharing sentence's root, the closest k
+        if similar_k is set; return () if there is none
+        """
+
+        rows = self.sentence_table.eligible_rows(sentence[2])
+        exclude = [] if sentence[0] is None else [(sentence[0], sentence[1])]
+        if self.similar_k:
+            found = self.sentence_vectors.similar(
+                sentence[-1].vector, k=self.similar_k, exclude=exclude, within=rows
+            )
+            row = self.sentence_table.row(*random.choice(found)) if found else None
+        else:
+            row = self.sentence_table.pick(rows, exclude)
+
+        return () if row is None else self.sentence_at(row)
+
     def find_mungeable_sentences(self):
 
         """ Fetch all sentence roots and their doc and sent indexes """
 
-        s_roots = []
-        for doc in self._documents:
-            s_roots.extend([s.root for s in doc.sents])
-        # list all lemmas occurring more than once as sentence roots
-        root_lemmas = find_duplicates([r.lemma_ for r in s_roots])
-        # locate sentences with identical root lemmas by document and sentence index
-        sentences = {k: [] for k in root_lemmas}
-        for i, doc in enumerate(self._documents):
-            for j, sent in enumerate(doc.sents):
-                if sent.root.lemma_ in root_lemmas:
-                    sentences[sent.root.lemma_].append((i, j))
+        # list all lemmas occurring more than once as sentence roots, and
+        # locate their sentences by document and sentence index
+        table = self.sentence_table
+        counts = np.bincount(table.lemma_ids, minlength=len(table.lemmas))
+        sentences = {table.lemmas[k]: [] for k in np.flatnonzero(counts > 1)}
+        for row in np.flatnonzero(counts[table.lemma_ids] > 1):
+            sentences[table.lemmas[table.lemma_ids[row]]].append(table.ids(row))
+
         return sentences
 
     @property
@@ -836,13 +1053,16 @@ class Scanner:
             the longest form of each name as key.
         """
 
-        if isinstance(document) != Doc:
-            if isinstance(document) == str:
-                self._document = nlp(document)
-            else:
-                raise TypeError("Scanner.scan requires str or Doc")
-        else:
+        if isinstance(document, Doc):
             self._document = document
+        elif isinstance(document, str):
+            self._document = nlp(document)
+        else:
+            raise TypeError("Scanner.scan requires str or Doc")
+        ENTITIES.inc(
+            sum(ent.label_ == self._entity_type for ent in self._document.ents),
+            label=self._entity_type,
+        )
 
         for alt_name in sorted(
             [
@@ -1002,48 +1222,32 @@ class DocumentCatalog:
 
     """Collections of named Entities extracted from across muntiple docs """
 
-    def __init__(self):
+    def __init__(self, cached_docs=64):
 
-        """Collect documents and related named entity info """
+        """Collect documents and related named entity info
 
-        try:
-            Doc.set_extension("title", default=None)
-            Doc.set_extension("byline", default=None)
-            Doc.set_extension("timestamp", default=None)
-            Doc.set_extension("dateline", default=None)
-            Doc.set_extension("people", default=None)
-        except ValueError:
-            # Reloading pickled
-            pass
+        ARGS: cached_docs (optional) live Docs kept by LazyDocuments;
+        None keeps every Doc in a plain list; DEFAULT: 64
+        """
+
+        register_doc_extensions()
+        if WikiLead.index is None and os.path.isfile(WIKI_INDEX + ".idx"):
+            WikiLead.use_index(WIKI_INDEX)
 
         self.aggregator = load_or_refresh_ag()
         self.created_at = datetime.datetime.now().isoformat()
-        self.documents = []
+        stories = self.aggregator.stories
+        if cached_docs is None:
+            self.documents = parse_stories(stories)
+        else:
+            self.documents = LazyDocuments(
+                (parse_story(story) for story in stories), cached_docs
+            )
         self.people = []
         self.orgs = []
         self.gpes = []
-
-        dateline_pattern = re.compile(r"^([A-Z][A-Z ,][^—]*?— )", flags=re.MULTILINE)
-
-        for i, story in enumerate(self.aggregator.stories):
-            text = story.content["text"]
-            dateline = None
-            # pylint disable=bare-except
-            # Need to ignore ALL errors, even if not BaseException
-            try:
-                dateline = dateline_pattern.search(text)[0]
-            except:
-                pass
-
-            self.documents.append(
-                strip_bottoms([(nlp(dateline_pattern.sub("", text)))])[0]
-            )
-
-            self.documents[i]._.title = story.title
-            self.documents[i]._.byline = story.byline
-            self.documents[i]._.dateline = dateline
-            self.documents[i]._.timestamp = story.timestamp
-
+        self.person_info = {}
+        watch_catalog_memory(self.documents)
 
     def collect_people(self):
 
@@ -1068,6 +1272,19 @@ class DocumentCatalog:
                 if addme:
                     self.people.append(person)
 
+    def collect_person_info(self):
+
+        """Classify every PERSON entity in the catalog in a single pass """
+
+        self.person_info = get_people_info(
+            ent.text
+            for doc in self.documents
+            for ent in doc.ents
+            if ent.label_ == "PERSON"
+        )
+
+        return self.person_info
+
     def collect_orgs(self):
 
         """Collect list of Organization objects """
@@ -1118,55 +1335,585 @@ class DocumentCatalog:
         return "<DocumentCatalog: {}>".format(self.created_at)
 
 
-# Functions
+class CatalogSegment:
+
+    """One day of parsed stories, stored as a spaCy DocBin on disk.
+
+    The DocBin (tmp/docs_YYYYMMDD.spacy) is built from that day's pickled
+    Aggregator the first time the segment is loaded. The segment's sentence
+    table and vectors are kept after its Docs are evicted, and so is
+    doc_bytes, the serialized size of its Docs as loaded, which stands in
+    for their resident memory.
+    """
+
+    def __init__(self, day, directory="tmp"):
 
+        """ARGS: day (datetime.date), directory holding the day's files """
 
-def balance_quotes(sentence):
+        self.day = day
+        self.stamp = day.strftime("%Y%m%d")
+        self.path = os.path.join(directory, "docs_{}.spacy".format(self.stamp))
+        self.source = os.path.join(directory, "ag_{}.pkl".format(self.stamp))
+        self.count = None
+        self.table = None
+        self.vectors = None
+        self.tree = None
+        self.fingerprint = None
+        self.doc_bytes = 0
 
-    """Ballance double quotes using spaCy token attributes """
+    @property
+    def available(self):
+
+        """True if the day has been scraped """
+
+        return os.path.isfile(self.path) or os.path.isfile(self.source)
+
+    @property
+    def disk_bytes(self):
+
+        """Size of the segment's DocBin file """
 
-    # pylint: disable=invalid-name
-    # Will change when refactoring
+        return os.path.getsize(self.path) if os.path.isfile(self.path) else 0
 
-    sent = sentence[-1]
-    hasq = [t for t in sent if t.orth_ in ["“", "”"]]
-    text = ""
-    center = sent.root.i - sent.start
-    lefts = [t.i - sent.start for t in hasq if t.i - sent.start < center]
-    elements = [t.text_with_ws for t in sent]
-    if len(lefts) % 2:
-        if lefts[0] != 0:
-            text += "“"
-            fixcaps = re.sub(
-                r"^\W+(\w+)", r"\1", "".join(elements[: center + 1])
-            ).split(" ")
-            fixcaps[0] = string.capwords((fixcaps[0]))
-            text += " ".join(fixcaps)
+    def load(self):
+
+        """Return the segment's Docs, parsing and saving them if need be """
+
+        if os.path.isfile(self.path):
+            docbin = DocBin(store_user_data=True).from_disk(self.path)
+            documents = list(docbin.get_docs(nlp.vocab))
         else:
-            ri = [
-                t.i - sent.start
-                for t in sent
-                if t.i < sent.root.i and t.dep_ == "punct"
-            ][-1] + 1
-            text += "".join(elements[:ri])
-            text += "”"
-            text += "".join(elements[ri : center + 1])
-    else:
-        text += "".join(elements[: center + 1])
+            with open(self.source, "rb") as pkl:
+                documents = parse_stories(pickle.load(pkl).stories)
+            DocBin(docs=documents, store_user_data=True).to_disk(self.path)
+        if self.table is None:
+            self.count = len(documents)
+            self.table = SentenceTable(documents)
+            self.vectors = sentence_matrix(documents)
+            self.tree = DependencyTree(documents)
+            self.fingerprint = catalog_fingerprint(documents)
+            self.doc_bytes = sum(len(doc.to_bytes()) for doc in documents)
+
+        return documents
+
+    def __repr__(self):
+        return "<CatalogSegment {}: {} docs>".format(self.stamp, self.count)
+
+
+class RollingCatalog:
+
+    """Stories from the last N days, as day segments loaded on demand.
+
+    Each available day is loaded once to build its sentence indexes, which
+    are merged across segments; after that, a day's Docs are only loaded
+    when a Munger reaches into it, and the least recently used segments
+    are evicted to keep the resident Docs under max_bytes, as measured by
+    CatalogSegment.doc_bytes.
+
+        catalog = RollingCatalog(days=30)
+        corpse = ExquisiteCorpse(catalog.documents)
+    """
+
+    def __init__(
+        self, days=7, max_bytes=256 << 20, directory="tmp", today=None, crawl=None
+    ):
+
+        """ARGS: days, max_bytes, directory; today DEFAULT: the current date;
+        crawl, called with the pickle path when today's segment is missing,
+        DEFAULT: load_or_refresh_ag
+        """
+
+        register_doc_extensions()
+        today = today or datetime.date.today()
+        self.max_bytes = max_bytes
+        self.loads = 0
+        self._resident = OrderedDict()
+        self.segments = []
+        for back in range(days - 1, -1, -1):
+            segment = CatalogSegment(today - datetime.timedelta(days=back), directory)
+            if back == 0 and not segment.available:
+                (crawl or load_or_refresh_ag)(cached=segment.source)
+                if not segment.available:
+                    print("No stories for {}".format(segment.stamp))
+            if segment.available:
+                self.segments.append(segment)
+        for segment in self.segments:
+            self.load(segment)
+        self.documents = RollingDocuments(self)
+        watch_catalog_memory(self.documents)
+
+    def load(self, segment):
+
+        """Docs of a segment, loading it and evicting others as needed """
+
+        if segment.stamp in self._resident:
+            self._resident.move_to_end(segment.stamp)
+            return self._resident[segment.stamp]
+        documents = segment.load()
+        self.loads += 1
+        self._resident[segment.stamp] = documents
+        while len(self._resident) > 1 and self.resident_bytes > self.max_bytes:
+            self._resident.popitem(last=False)
+
+        return documents
 
-    text += "".join([e for e in elements[center + 1 :] if e not in ["“", "”"]])
+    @property
+    def resident_bytes(self):
+
+        """Size of the Docs currently held in memory """
+
+        return sum(s.doc_bytes for s in self.segments if s.stamp in self._resident)
+
+    def __repr__(self):
+        return "<RollingCatalog: {} days, {} resident>".format(
+            len(self.segments), len(self._resident)
+        )
+
+
+class PartitionedDocuments(Sequence):
+
+    """Read-only list view of documents held in consecutive parts.
+
+    Also carries the parts' merged sentence_table, sentence_vectors,
+    dependency_tree (when the parts have trees) and fingerprint, which
+    Munger picks up instead of scanning every document. Subclasses fetch a
+    document by part and index within the part.
+    """
 
-    s = next(islice(nlp(text).sents, 0, None))
+    def __init__(self, counts, tables, vectors, fingerprints, trees=None):
 
-    return (None, None, s.root.lemma_, s)
+        """Number documents across parts, and merge their indexes """
 
+        self._starts = np.cumsum([0] + list(counts))
+        self.sentence_table = SentenceTable.merge(tables)
+        table = self.sentence_table
+        vectors = [v for v in vectors if len(v)]
+        self.sentence_vectors = SentenceVectors(
+            np.vstack(vectors) if vectors else np.zeros((0, 1), np.float32),
+            table.doc_ids,
+            table.sent_ids,
+            [table.lemmas[k] for k in table.lemma_ids],
+        )
+        self.fingerprint = hashlib.sha1(
+            "".join(fingerprints).encode("utf-8")
+        ).hexdigest()[:16]
+        self.dependency_tree = None if trees is None else DependencyTree.merge(trees)
+
+    def part(self, index):
+
+        """(part, index within part) of a document index """
+
+        part = int(np.searchsorted(self._starts, index, side="right")) - 1
+
+        return part, int(index - self._starts[part])
+
+    def fetch(self, part, index):
+
+        """Return document index of part """
+
+        raise NotImplementedError
+
+    @property
+    def index_bytes(self):
 
-def get_person_info(person):
+        """Size of the sentence table and vector arrays """
+
+        indexes = (self.sentence_table, self.sentence_vectors, self.dependency_tree)
+
+        return sum(
+            value.nbytes
+            for index in indexes
+            if index is not None
+            for value in vars(index).values()
+            if isinstance(value, np.ndarray)
+        )
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("document index out of range")
+
+        return self.fetch(*self.part(index))
+
+    def __len__(self):
+        return int(self._starts[-1])
+
+
+class RollingDocuments(PartitionedDocuments):
+
+    """Documents of a RollingCatalog, one part per day segment """
+
+    def __init__(self, catalog):
+
+        """ARGS: catalog, a RollingCatalog whose segments are all indexed """
+
+        segments = catalog.segments
+        super().__init__(
+            [s.count for s in segments],
+            [s.table for s in segments],
+            [s.vectors for s in segments],
+            [s.fingerprint for s in segments],
+            [s.tree for s in segments],
+        )
+        self.catalog = catalog
+
+    def fetch(self, part, index):
+
+        """Load the day segment if need be """
+
+        return self.catalog.load(self.catalog.segments[part])[index]
+
+    @property
+    def nbytes(self):
+
+        """Size of the day segments' Docs held in memory """
+
+        return self.catalog.resident_bytes
+
+
+class LazyDocuments(PartitionedDocuments):
+
+    """Documents kept as serialized bytes and materialized on access.
+
+    Each Doc is indexed as it arrives and then stored as Doc.to_bytes
+    (without its tensor); at most cached_docs live Docs are kept, least
+    recently used first out, so resident memory follows the working set.
+    """
+
+    def __init__(self, documents, cached_docs=64):
+
+        """ARGS: documents, any iterable of Docs; cached_docs, LRU size """
+
+        self._bytes = []
+        tables, vectors, fingerprints, trees = [], [], [], []
+        for doc in documents:
+            tables.append(SentenceTable([doc]))
+            vectors.append(sentence_matrix([doc]))
+            fingerprints.append(catalog_fingerprint([doc]))
+            trees.append(DependencyTree([doc]))
+            self._bytes.append(doc.to_bytes(exclude=["tensor"]))
+        super().__init__(
+            [1] * len(self._bytes), tables, vectors, fingerprints, trees
+        )
+        self.cached_docs = cached_docs
+        self._docs = OrderedDict()
+
+    def fetch(self, part, index):
+
+        """Materialize a Doc, or take it from the LRU """
+
+        if part in self._docs:
+            self._docs.move_to_end(part)
+            return self._docs[part]
+        doc = Doc(nlp.vocab).from_bytes(self._bytes[part])
+        self._docs[part] = doc
+        if len(self._docs) > self.cached_docs:
+            self._docs.popitem(last=False)
+
+        return doc
+
+    @property
+    def nbytes(self):
+
+        """Total size of the serialized Docs """
+
+        return sum(len(b) for b in self._bytes)
+
+
+class ShardedCatalog:
+
+    """Stories parsed and held by worker processes, one shard each.
+
+    Each worker parses its contiguous slice of the stories, so ingest runs
+    on as many cores as there are workers, and keeps its Docs; only the
+    shards' sentence tables and vectors come back to be merged. Munger
+    queries go out to the shards and their answers are merged:
+
+        catalog = ShardedCatalog(workers=4)
+        corpse = ExquisiteCorpse(catalog.documents)
+        ...
+        catalog.close()
+    """
+
+    def __init__(self, workers=None, stories=None, cached_docs=64):
+
+        """ARGS: workers DEFAULT: CPU count; stories DEFAULT: today's;
+        cached_docs, number of fetched Docs kept in this process
+        """
+
+        register_doc_extensions()
+        if stories is None:
+            stories = load_or_refresh_ag().stories
+        workers = max(1, min(workers or os.cpu_count() or 1, len(stories)))
+        bounds = [len(stories) * n // workers for n in range(workers + 1)]
+        self._pipes = []
+        self._workers = []
+        for n in range(workers):
+            pipe, child = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=shard_worker,
+                args=(child, stories[bounds[n] : bounds[n + 1]]),
+                daemon=True,
+            )
+            worker.start()
+            self._pipes.append(pipe)
+            self._workers.append(worker)
+        self.shards = self.gather("index")
+        self.documents = ShardedDocuments(self, cached_docs)
+        watch_catalog_memory(self.documents)
+
+    def gather(self, method, args=None):
+
+        """Send a request to every shard (args: one per shard), then
+        collect their replies in shard order
+        """
+
+        for n, pipe in enumerate(self._pipes):
+            pipe.send((method, None if args is None else args[n]))
+        replies = [pipe.recv() for pipe in self._pipes]
+        for reply in replies:
+            if isinstance(reply, Exception):
+                raise reply
+
+        return replies
+
+    def ask(self, shard, method, arg=None):
+
+        """Send a request to one shard and return its reply """
+
+        self._pipes[shard].send((method, arg))
+        reply = self._pipes[shard].recv()
+        if isinstance(reply, Exception):
+            raise reply
+
+        return reply
+
+    def close(self):
+
+        """Stop the workers """
+
+        for pipe in self._pipes:
+            try:
+                pipe.send(("close", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return "<ShardedCatalog: {} shards, {} docs>".format(
+            len(self.shards), len(self.documents)
+        )
+
+
+class ShardedDocuments(PartitionedDocuments):
+
+    """Documents of a ShardedCatalog; fetched Docs are cached LRU """
+
+    def __init__(self, catalog, cached_docs=64):
+
+        """ARGS: catalog, a ShardedCatalog; cached_docs, LRU size """
+
+        shards = catalog.shards
+        super().__init__(
+            [s["count"] for s in shards],
+            [s["table"] for s in shards],
+            [s["vectors"] for s in shards],
+            [s["fingerprint"] for s in shards],
+        )
+        self.catalog = catalog
+        self.cached_docs = cached_docs
+        self._docs = OrderedDict()
+
+    def fetch(self, part, index):
+
+        """Fetch a Doc from its shard, or from the local LRU """
+
+        key = (part, index)
+        if key in self._docs:
+            self._docs.move_to_end(key)
+            return self._docs[key]
+        doc = Doc(nlp.vocab).from_bytes(self.catalog.ask(part, "doc", index))
+        self._docs[key] = doc
+        if len(self._docs) > self.cached_docs:
+            self._docs.popitem(last=False)
+
+        return doc
+
+    def subtrees(self, pairs):
+
+        """Gather and merge collect_subtrees answers from the shards """
+
+        local = [[] for _ in self.catalog.shards]
+        for i, j in pairs:
+            part, index = self.part(i)
+            local[part].append((index, j))
+        subtrees = {"left": dict(), "right": dict()}
+        for part, found in enumerate(self.catalog.gather("subtrees", local)):
+            base = int(self._starts[part])
+            for hand, deps in found.items():
+                for dep, trees in deps.items():
+                    subtrees[hand].setdefault(dep, []).extend(
+                        (i + base, j, text) for i, j, text in trees
+                    )
+
+        return subtrees
+
+
+# Functions
+
+
+def verbnet_lemmas(lemma):
+
+    """Lemmas sharing a VerbNet class with lemma, class by class """
+
+    # pylint: disable=import-outside-toplevel
+    # nltk is only needed when a root has no match in the catalog
+    from nltk.corpus import verbnet
+
+    return [lem for vnid in verbnet.classids(lemma) for lem in verbnet.lemmas(vnid)]
+
+
+def register_doc_extensions():
+
+    """Declare the custom Doc attributes the catalogs fill in """
+
+    try:
+        Doc.set_extension("title", default=None)
+        Doc.set_extension("byline", default=None)
+        Doc.set_extension("timestamp", default=None)
+        Doc.set_extension("dateline", default=None)
+        Doc.set_extension("people", default=None)
+        # (doc, sent) ids of the catalog sentences a munged sentence came from
+        Doc.set_extension("sources", default=None)
+    except ValueError:
+        # Reloading pickled
+        pass
+
+
+def shard_worker(pipe, stories):
+
+    """Parse and hold one shard of a ShardedCatalog, and answer requests:
+    index, doc, subtrees and close
+    """
+
+    register_doc_extensions()
+    documents = parse_stories(stories)
+    table = SentenceTable(documents)
+    tree = DependencyTree(documents)
+    while True:
+        method, arg = pipe.recv()
+        try:
+            # pylint: disable=broad-except
+            # Errors are sent back and raised in the parent
+            if method == "close":
+                break
+            if method == "index":
+                reply = {
+                    "count": len(documents),
+                    "table": table,
+                    "vectors": sentence_matrix(documents),
+                    "fingerprint": catalog_fingerprint(documents),
+                }
+            elif method == "doc":
+                reply = documents[arg].to_bytes()
+            elif method == "subtrees":
+                reply = collect_subtrees(documents, arg, tree)
+            else:
+                reply = ValueError("unknown shard request: {}".format(method))
+        except Exception as err:
+            reply = err
+        pipe.send(reply)
+    pipe.close()
+
+
+def subtree_span(token):
+
+    """The Span from a token's left edge to its right edge """
+
+    return token.doc[token.left_edge.i : token.right_edge.i + 1]
+
+
+def collect_subtrees(documents, pairs, tree=None):
+
+    """Subtree text of each root child in the given (doc, sent) sentences,
+    by hand and dependency; see Munger.fetch_subtrees
+
+    ARGS: documents, pairs, tree (optional) the documents' DependencyTree;
+    DEFAULT: one built for the documents in pairs
+    """
+
+    if tree is None:
+        ids = sorted({i for i, _ in pairs})
+        tree = DependencyTree([documents[i] for i in ids], ids)
+    rows = np.array([tree.row(i, j) for i, j in pairs], dtype=np.int64)
+    sources = np.flatnonzero(tree.roots[rows] >= 0)
+    # Each sentence row points back to its first place in pairs
+    position = np.full(len(tree.roots), -1, dtype=np.int64)
+    position[rows[sources][::-1]] = sources[::-1]
+    children = tree.children(tree.roots[rows[sources]], exclude=("punct",))
+    # Sentences in the order of pairs; children, left to right, within them
+    children = children[np.argsort(position[tree.sents[children]], kind="stable")]
+    subtrees = {"left": dict(), "right": dict()}
+    for child, text in zip(children, tree.texts(children)):
+        i, j = pairs[position[tree.sents[child]]]
+        hand = "left" if child < tree.heads[child] else "right"
+        subtrees[hand].setdefault(tree.label(tree.deps[child]), []).append(
+            (i, j, text)
+        )
+
+    return subtrees
+
+
+def watch_catalog_memory(documents):
+
+    """Export the memory of documents, the current catalog's, as the
+    catalog_bytes gauge; documents without indexes report 0
+    """
+
+    CATALOG_BYTES.set_function(lambda: getattr(documents, "nbytes", 0), part="docs")
+    CATALOG_BYTES.set_function(
+        lambda: getattr(documents, "index_bytes", 0), part="index"
+    )
+
+
+def parse_story(story):
+
+    """Normalize and parse a scraped story into a spaCy Doc """
+
+    text, dateline = normalize_text(story.content["text"])
+    doc = nlp(text)
+    doc._.title = story.title
+    doc._.byline = story.byline
+    doc._.dateline = dateline
+    doc._.timestamp = story.timestamp
+
+    return doc
+
+
+def parse_stories(stories):
+
+    """Normalize and parse scraped stories into spaCy Docs """
+
+    return [parse_story(story) for story in stories]
+
+
+def get_person_info(person, gazetteer=None):
 
     """Try to determine gender, etc. from the most complete PERSON reference.
 
     ARGS:
         person (required) string: all or part of the person's full name
+        gazetteer (optional) dict returned by helpers.load_gazetteer
 
     RETURNS:
         dict containing discoverable PERSON attributes
@@ -1174,6 +1921,8 @@ def get_person_info(person):
     TODO: Rewrite this in a spacy way
     """
 
+    if gazetteer is None:
+        gazetteer = load_gazetteer()
     gender = None
     honorific = None
     role = None
@@ -1182,25 +1931,19 @@ def get_person_info(person):
     last = None
     suffix = None
     tokens = deque([p for p in person.split(" ") if re.search(r"\w+", p)])
-    if tokens[-1] in MASCULINE_TITLES:
+    if tokens[0] in gazetteer["masculine"]:
         honorific = tokens.popleft()
         gender = "Male"
-    elif tokens[-1] in FEMININE_TITLES:
+    elif tokens[0] in gazetteer["feminine"]:
         honorific = tokens.popleft()
         gender = "Female"
-    if tokens[-1] in GENERIC_TITLES:
+    if tokens[0] in gazetteer["generic"]:
         role = tokens.popleft()
-    elif re.match(r"\w\w+\.", tokens[-1]):
+    elif re.match(r"\w\w+\.", tokens[0]):
         role = tokens.popleft()
-    # At this point, element -1 should be either the first name or initial.
-    if tokens[-1] in names.words("female.txt"):
-        if not gender:
-            gender = "Female"
-    if tokens[-1] in names.words("male.txt"):
-        if not gender:
-            gender = "Male"
-        elif not honorific:
-            gender = "Unknown"
+    # At this point, element 0 should be either the first name or initial.
+    if not gender:
+        gender = gazetteer["names"].get(tokens[0])
     first = tokens.popleft()
     try:
         # Check for suffix: 'Esq.', 'Jr.'. 'Sr. etc.
@@ -1228,53 +1971,95 @@ def get_person_info(person):
     }
 
 
-def sent_from_wordlist(elements):
+def get_people_info(people):
 
-    """ Convert a list of word_texts to a spacy sentence """
+    """Classify a batch of PERSON references against one loaded gazetteer.
 
-    text = " ".join(elements)
-    text = re.sub(r"[\n\s]+", " ", text)
-    text = re.sub(r"\s+([,\.\!\?])", r"\1", text)
-    sent = next(islice(nlp(text).sents, 0, None))
+    ARGS:
+        people (required) iterable of name strings
 
-    return (None, None, sent.root.lemma_, sent)
+    RETURNS:
+        dict of name -> get_person_info result, one entry per unique name
+    """
+
+    gazetteer = load_gazetteer()
+    info = {}
+    for person in people:
+        if person not in info and re.search(r"\w+", person):
+            info[person] = get_person_info(person, gazetteer)
 
+    return info
 
-def strip_bottoms(documents):
 
-    """Remove article byline and ads from the article body """
+def catalog_fingerprint(documents):
 
-    stripped = []
+    """Short digest identifying a list of documents, for cache keys """
 
+    if getattr(documents, "fingerprint", None):
+        return documents.fingerprint
+    digest = hashlib.sha1()
     for doc in documents:
+        digest.update("{}\t{}\n".format(len(doc), doc.text[:80]).encode("utf-8"))
+
+    return digest.hexdigest()[:16]
 
-        try:
-            end = [s.root.i for s in doc.sents if s.root.orth_ == "_"][0] - 2
-        except IndexError:
-            end = -1
-        stripped.append(doc[:end].as_doc())
-        stripped[-1]._.title = doc._.title
-        stripped[-1]._.byline = doc._.byline
-        stripped[-1]._.timestamp = doc._.timestamp
-        stripped[-1]._.dateline = doc._.dateline
-        stripped[-1]._.people = doc._.people
 
-    return stripped
+def munge_key_part(value):
 
+    """Hashable cache key part for a munge argument.
 
-def traverse(node):
+    Sentence tuples are identified by their (doc, sent) ids; munged
+    sentences have none and can't be cached (ValueError).
+    """
+
+    if isinstance(value, tuple) and len(value) == 4:
+        if value[0] is None:
+            raise ValueError("sentence has no source ids")
+        return (value[0], value[1])
+    if isinstance(value, list):
+        return tuple(value)
+
+    return value
 
-    """ Return a depth-first parse tree for a given node """
 
-    if node.n_lefts + node.n_rights > 0:
-        return [(node.i, node), [traverse(child) for child in node.children]]
+def sentence_sources(*sentences):
 
-    return (node.i, node)
+    """(doc, sent) ids of the catalog sentences that went into the given
+    sentence tuples: their own ids, or for munged sentences the sources
+    recorded on their Doc; in order, without repeats
+    """
+
+    sources = []
+    for sentence in sentences:
+        if not sentence:
+            continue
+        if sentence[0] is not None:
+            ids = [(sentence[0], sentence[1])]
+        else:
+            ids = [tuple(pair) for pair in sentence[-1].doc._.sources or []]
+        sources.extend(pair for pair in ids if pair not in sources)
 
+    return sources
 
-def load_or_refresh_ag(topic_list=None):
 
-    """Scrape today's news or reload id from the pickle. """
+def sent_from_wordlist(elements):
+
+    """ Convert a list of word_texts to a spacy sentence """
+
+    text = " ".join(elements)
+    text = re.sub(r"[\n\s]+", " ", text)
+    text = re.sub(r"\s+([,\.\!\?])", r"\1", text)
+    sent = next(islice(nlp(text).sents, 0, None))
+
+    return (None, None, sent.root.lemma_, sent)
+
+
+def load_or_refresh_ag(topic_list=None, cached=None):
+
+    """Scrape today's news or reload id from the pickle.
+
+    ARGS: topic_list; cached, the pickle path DEFAULT: tmp/ag_<today>.pkl
+    """
 
     if topic_list:
         topics = topic_list
@@ -1294,8 +2079,7 @@ def load_or_refresh_ag(topic_list=None):
             "Religion",
         ]
 
-    cached = datetime.datetime.today().strftime("tmp/ag_%Y%m%d.pkl")
-    # cached = "./tmp/ag_20200808.pkl"
+    cached = cached or datetime.datetime.today().strftime("tmp/ag_%Y%m%d.pkl")
     if os.path.isfile(cached):
         with open(cached, "rb") as pkl:
             agg = pickle.load(pkl)
@@ -1311,7 +2095,7 @@ def load_or_refresh_ag(topic_list=None):
                 try:
                     # pylint: disable=broad-except
                     # Article fetching is error prone; skip it and try another
-                    agg.fetch_ap_article(url)
+                    agg.fetch_ap_article(url, topic)
                 except Exception as err:
                     print(f"Skipping article:\n{err}")
                     time.sleep(3)
@@ -1322,6 +2106,7 @@ def load_or_refresh_ag(topic_list=None):
                 if len(agg.stories) >= stopat:
                     break
 
+        os.makedirs(os.path.dirname(cached) or ".", exist_ok=True)
         with open(cached, "wb") as pkl:
             pickle.dump(agg, pkl)
 
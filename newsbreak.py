@@ -3,13 +3,50 @@
 
 """ This module provides a command line interface to news_munger. """
 
+import os
+import gzip
+import json
+import time
 import datetime
 import random
 import argparse
-from munger import DocumentCatalog, Munger
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import metrics
+from munger import (
+    DocumentCatalog,
+    RollingCatalog,
+    ShardedCatalog,
+    Munger,
+    MungeCache,
+    sentence_sources,
+)
 
 parser = argparse.ArgumentParser()
-parser.parse_args()
+parser.add_argument(
+    "--serve", action="store_true", help="keep the model and catalog loaded"
+)
+parser.add_argument("--host", default="127.0.0.1", help="address to serve on")
+parser.add_argument("--port", type=int, default=8642, help="port to serve on")
+parser.add_argument(
+    "--build", type=int, default=0, metavar="N", help="stream N corpses to tmp/*.jsonl"
+)
+parser.add_argument("--compress", action="store_true", help="gzip the jsonl output")
+parser.add_argument(
+    "--days", type=int, default=1, help="build from a rolling catalog of N days"
+)
+parser.add_argument(
+    "--workers", type=int, default=0, help="parse and hold stories in N shards"
+)
+parser.add_argument(
+    "--metrics", metavar="FILE", help="write Prometheus metrics to FILE at exit"
+)
+
+CORPSES = metrics.counter("corpses_built_total", "Exquisite corpses built")
+CORPSE_SECONDS = metrics.histogram(
+    "corpse_build_seconds", "Seconds to build one exquisite corpse"
+)
 
 
 ## Classes ##
@@ -26,6 +63,98 @@ class MadLib(Munger):
         return "<MadLib: {}>".format(self.headline)
 
 
+class CorpseWriter:
+
+    """Stream corpses to JSONL files, one record per line, as they are built.
+
+    Output is buffered, and a new file is started each day or whenever the
+    current one passes max_bytes (counted before compression):
+    tmp/exq_20200808_000.jsonl[.gz], tmp/exq_20200808_001.jsonl[.gz], ...
+    """
+
+    def __init__(
+        self, directory="tmp", prefix="exq", max_bytes=64 << 20, compress=False
+    ):
+
+        """ARGS: directory, prefix, max_bytes, compress (gzip each file) """
+
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.records = 0
+        self._file = None
+        self._day = None
+        self._part = 0
+        self._size = 0
+
+    @property
+    def path(self):
+
+        """Path of the file currently being written """
+
+        return os.path.join(
+            self.directory,
+            "{}_{}_{:03d}.jsonl{}".format(
+                self.prefix, self._day, self._part, ".gz" if self.compress else ""
+            ),
+        )
+
+    def _rotate(self):
+
+        """Close the current file and open the next free part for today """
+
+        self.close()
+        day = datetime.datetime.today().strftime("%Y%m%d")
+        if day != self._day:
+            self._day = day
+            self._part = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._size = 0
+        while os.path.isfile(self.path):
+            self._size = os.path.getsize(self.path)
+            if self._size < self.max_bytes:
+                break
+            self._part += 1
+            self._size = 0
+        if self.compress:
+            self._file = gzip.open(self.path, "ab")
+        else:
+            self._file = open(self.path, "ab", buffering=1 << 16)
+
+    def write(self, record):
+
+        """Append one record, rotating first if the day or size demands it """
+
+        if (
+            self._file is None
+            or self._size >= self.max_bytes
+            or datetime.datetime.today().strftime("%Y%m%d") != self._day
+        ):
+            self._rotate()
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        self._file.write(line)
+        self._size += len(line)
+        self.records += 1
+
+    def close(self):
+
+        """Flush and close the current file """
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return "<CorpseWriter: {} records, {}>".format(self.records, self.path)
+
+
 class ExquisiteCorpse(Munger):
 
     """
@@ -34,14 +163,29 @@ class ExquisiteCorpse(Munger):
     See: https://en.wikipedia.org/wiki/Exquisite_corpse
     """
 
-    def __init__(self, documents):
+    def __init__(self, documents, writer=None, cache=None):
 
-        """Initialize super; and declare corpse list. """
-        super().__init__(documents)
+        """Initialize super; and declare corpse list.
+
+        When a CorpseWriter is supplied, each corpse is streamed to it as it
+        is built instead of being kept in the corpse list. A MungeCache is
+        passed on to Munger.
+        """
+        super().__init__(documents, cache=cache)
         self.corpses = []
+        self.writer = writer
 
-    def build(self):
-        """Munge news stories to create an esquisite cadavre. """
+    def build(self, seed=None, echo=True):
+        """Munge news stories to create an esquisite cadavre.
+
+        ARGS: seed (optional) seeds the RNG, so a build can be repeated
+        over the same catalog; DEFAULT: a random seed, kept in the corpse;
+        echo, print the corpse's text
+        """
+        start = time.perf_counter()
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        random.seed(seed)
         text = ""
         base_index = random.randrange(len(self._documents))
         base = self._documents[base_index]
@@ -57,10 +201,44 @@ class ExquisiteCorpse(Munger):
 
             sentences.append(sentence)
 
-        self.corpses.append({"title": base._.title, "sentences": sentences})
+        corpse = {
+            "title": base._.title,
+            "sentences": sentences,
+            "source": base_index,
+            "seed": seed,
+        }
+        if self.writer:
+            self.writer.write(self.record(corpse))
+        else:
+            self.corpses.append(corpse)
 
+        CORPSES.inc()
+        CORPSE_SECONDS.observe(time.perf_counter() - start)
         text += "\n".join([sent[-1].text_with_ws for sent in sentences])
-        print(text)
+        if echo:
+            print(text)
+
+        return corpse
+
+    @staticmethod
+    def record(corpse):
+
+        """JSON-ready record of a corpse; each sentence lists the (doc, sent)
+        ids of the catalog sentences it was munged from
+        """
+
+        return {
+            "title": corpse["title"],
+            "seed": corpse["seed"],
+            "source": corpse["source"],
+            "sentences": [
+                {
+                    "text": sent[-1].text,
+                    "sources": [list(pair) for pair in sentence_sources(sent)],
+                }
+                for sent in corpse["sentences"]
+            ],
+        }
 
     def save(self, cadavre=None):
 
@@ -81,8 +259,194 @@ class ExquisiteCorpse(Munger):
         return "<ExquisiteCorpse: {}>".format(self.headline)
 
 
+class NewsbreakServer(ThreadingHTTPServer):
+
+    """Keep spaCy and a DocumentCatalog resident and munge on request.
+
+    Endpoints (localhost only by default):
+        GET  /corpses?n=N   build N exquisite corpses
+        POST /refresh       rebuild the catalog in the background
+        GET  /stats         catalog and service statistics
+        GET  /metrics       Prometheus metrics
+    """
+
+    max_corpses = 100
+
+    def __init__(self, address, catalog=DocumentCatalog):
+
+        """Load the catalog once, then start listening
+
+        ARGS: address; catalog, called with no arguments to load the catalog
+        now and on each refresh DEFAULT: DocumentCatalog
+        """
+
+        super().__init__(address, NewsbreakHandler)
+        self.load_catalog = catalog
+        self.started_at = time.time()
+        self.corpses_built = 0
+        self.refreshed_at = None
+        self._munge_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.catalog = self.load_catalog()
+        self.corpse = ExquisiteCorpse(self.catalog.documents, cache=MungeCache())
+
+    def build(self, count):
+
+        """Build count corpses; return them as title and text dicts """
+
+        corpses = []
+        with self._munge_lock:
+            corpse = self.corpse
+            for _ in range(count):
+                built = corpse.build(echo=False)
+                text = "".join(s[-1].text_with_ws for s in built["sentences"])
+                corpses.append({"title": built["title"], "text": text})
+            corpse.corpses.clear()
+            self.corpses_built += count
+
+        return corpses
+
+    def refresh(self):
+
+        """Start rebuilding the catalog unless a refresh is already running """
+
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        threading.Thread(target=self._refresh, daemon=True).start()
+
+        return True
+
+    def _refresh(self):
+
+        """Build a new catalog off to the side, then swap it in """
+
+        try:
+            # pylint: disable=broad-except
+            # A failed refresh must not take the service down
+            catalog = self.load_catalog()
+            corpse = ExquisiteCorpse(catalog.documents, cache=MungeCache())
+            with self._munge_lock:
+                self.catalog, self.corpse = catalog, corpse
+            self.refreshed_at = time.time()
+        except Exception as err:
+            print("Catalog refresh failed: {}".format(err))
+        finally:
+            self._refresh_lock.release()
+
+    def stats(self):
+
+        """Service statistics """
+
+        return {
+            "catalog": repr(self.catalog),
+            "documents": len(self.catalog.documents),
+            "corpses_built": self.corpses_built,
+            "munge_cache": self.corpse.munge_cache.stats(),
+            "refreshing": self._refresh_lock.locked(),
+            "refreshed_at": self.refreshed_at,
+            "uptime": round(time.time() - self.started_at, 1),
+        }
+
+
+class NewsbreakHandler(BaseHTTPRequestHandler):
+
+    """JSON request handler for NewsbreakServer """
+
+    def _reply(self, status, payload):
+
+        """Send payload as a JSON response """
+
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _metrics(self):
+
+        """Reply with the metrics registry as Prometheus text """
+
+        body = metrics.REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", metrics.CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _corpses(self, query):
+
+        """Reply with the number of corpses asked for in the query """
+
+        try:
+            count = int(parse_qs(query).get("n", ["1"])[0])
+        except ValueError:
+            count = 0
+        limit = self.server.max_corpses
+        if not 0 < count <= limit:
+            self._reply(400, {"error": "n must be 1-{}".format(limit)})
+        else:
+            self._reply(200, self.server.build(count))
+
+    # pylint: disable=invalid-name
+    # BaseHTTPRequestHandler dispatches on these names
+
+    def do_GET(self):
+
+        """Serve /corpses, /stats and /metrics """
+
+        url = urlparse(self.path)
+        if url.path == "/corpses":
+            self._corpses(url.query)
+        elif url.path == "/stats":
+            self._reply(200, self.server.stats())
+        elif url.path == "/metrics":
+            self._metrics()
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+
+        """Serve /corpses and /refresh """
+
+        url = urlparse(self.path)
+        if url.path == "/corpses":
+            self._corpses(url.query)
+        elif url.path == "/refresh":
+            self._reply(202, {"refreshing": self.server.refresh()})
+        else:
+            self._reply(404, {"error": "not found"})
+
+
 if __name__ == "__main__":
 
-    catalog = DocumentCatalog()
+    args = parser.parse_args()
+    if args.metrics:
+        metrics.dump_at_exit(args.metrics)
+    if args.serve:
+        server = NewsbreakServer((args.host, args.port))
+        print("Serving newsbreak on http://{}:{}/".format(args.host, args.port))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+    else:
+        if args.days > 1:
+            catalog = RollingCatalog(days=args.days)
+        elif args.workers:
+            catalog = ShardedCatalog(workers=args.workers)
+        else:
+            catalog = DocumentCatalog()
+        if args.build:
+            munge_cache = MungeCache(path="tmp/munge_cache")
+            with CorpseWriter(compress=args.compress) as corpse_writer:
+                exquisite = ExquisiteCorpse(
+                    catalog.documents, writer=corpse_writer, cache=munge_cache
+                )
+                for _ in range(args.build):
+                    exquisite.build()
+            munge_cache.close()
+            print(corpse_writer)
+            print(munge_cache)
 
     # Unit Tests #
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Record the scrapers' HTTP traffic and serve it back offline.
+
+Record a whole load_or_refresh_ag crawl (AP hub pages, articles and any
+Wikipedia lookups made through httpclient) into an archive directory:
+
+    python replay.py record fixtures/crawl
+
+then serve it on localhost with simulated latency and injected errors:
+
+    python replay.py serve fixtures/crawl --latency 0.05 --errors 0.02
+
+With httpclient.route(server.url) every scraper request goes to the replay
+server instead of the network; ReplayServer does that for the duration
+of a with block. See benchmarks.bench_replay_crawl.
+"""
+
+import os
+import json
+import random
+import hashlib
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urldefrag
+from requests.utils import requote_uri
+import httpclient
+
+parser = argparse.ArgumentParser()
+parser.add_argument("mode", choices=("record", "serve"), help="what to do")
+parser.add_argument("archive", help="archive directory")
+parser.add_argument("--host", default="127.0.0.1", help="address to serve on")
+parser.add_argument("--port", type=int, default=8643, help="port to serve on")
+parser.add_argument(
+    "--latency", type=float, default=0.0, help="seconds before each response"
+)
+parser.add_argument(
+    "--jitter", type=float, default=0.0, help="up to this many more seconds"
+)
+parser.add_argument(
+    "--errors", type=float, default=0.0, help="fraction of requests that fail"
+)
+parser.add_argument(
+    "--status", type=int, default=503, help="status of failures; 0 drops them"
+)
+
+
+def archive_key(url):
+
+    """A url as it goes over the wire: percent-encoded, without fragment.
+
+    Scrapers build urls with raw non-ASCII names and spaces, and the
+    replay server sees them encoded; both sides are keyed this way.
+    """
+
+    return requote_uri(urldefrag(url)[0])
+
+
+class Archive:
+
+    """A directory of recorded responses.
+
+    index.jsonl has one line per response (url, status, content type and
+    body file name); bodies are kept decoded, one file each. Urls are
+    looked up by archive_key, and when a url is recorded more than once
+    the last response wins.
+    """
+
+    def __init__(self, directory):
+
+        """Open, or start, the archive in directory """
+
+        self.directory = directory
+        self._entries = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        index = os.path.join(directory, "index.jsonl")
+        if os.path.isfile(index):
+            with open(index) as infile:
+                for line in infile:
+                    entry = json.loads(line)
+                    self._entries[archive_key(entry["url"])] = entry
+
+    def add(self, url, status, headers, body):
+
+        """Record a response; headers may be any mapping """
+
+        url = archive_key(url)
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()[:20] + ".body"
+        entry = {
+            "url": url,
+            "status": status,
+            "content_type": headers.get("Content-Type"),
+            "body": name,
+            "bytes": len(body),
+        }
+        with self._lock:
+            with open(os.path.join(self.directory, name), "wb") as outfile:
+                outfile.write(body)
+            with open(os.path.join(self.directory, "index.jsonl"), "a") as outfile:
+                outfile.write(json.dumps(entry) + "\n")
+            self._entries[url] = entry
+
+    def get(self, url):
+
+        """RETURNS: (status, content type, body) for url, or None """
+
+        entry = self._entries.get(archive_key(url))
+        if entry is None:
+            return None
+        with open(os.path.join(self.directory, entry["body"]), "rb") as infile:
+            return entry["status"], entry["content_type"], infile.read()
+
+    def urls(self):
+
+        """The recorded urls """
+
+        return list(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return "<Archive {}: {} responses>".format(self.directory, len(self))
+
+
+class ReplayServer(ThreadingHTTPServer):
+
+    """Serve an Archive at http://host:port/<original url>.
+
+    Every response waits latency plus up to jitter seconds; error_rate of
+    them are replaced by error_status (0 drops the connection instead).
+    Urls missing from the archive get a 404. Within a with block the server
+    runs in a background thread and httpclient is routed to it.
+    """
+
+    def __init__(
+        self,
+        archive,
+        address=("127.0.0.1", 0),
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        error_status=503,
+        seed=None,
+    ):
+
+        """ARGS: archive (Archive or directory), address, latency, jitter,
+        error_rate, error_status, seed (for the jitter and error draws)
+        """
+
+        super().__init__(address, ReplayHandler)
+        self.archive = archive if isinstance(archive, Archive) else Archive(archive)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.errors = 0
+        self.misses = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+
+        """Base url to route requests to """
+
+        return "http://{}:{}".format(*self.server_address[:2])
+
+    def draw(self):
+
+        """Count a request; RETURNS: (seconds to wait, whether it fails) """
+
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+
+        return delay, failed
+
+    def miss(self):
+
+        """Count a request for a url that was never recorded """
+
+        with self._lock:
+            self.misses += 1
+
+    def stats(self):
+
+        """Requests served, errors injected and archive misses """
+
+        return {"requests": self.requests, "errors": self.errors, "misses": self.misses}
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        httpclient.route(self.url)
+        return self
+
+    def __exit__(self, *exc):
+        httpclient.route(None)
+        self.shutdown()
+        self.server_close()
+
+    def __repr__(self):
+        return "<ReplayServer {}: {}>".format(self.url, self.stats())
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+
+    """Replay archived responses for ReplayServer """
+
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status, content_type, body):
+
+        """Send a complete, keep-alive response """
+
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # pylint: disable=invalid-name
+    # BaseHTTPRequestHandler dispatches on these names
+
+    def do_GET(self):
+
+        """Serve the archived response for the url in the path """
+
+        delay, failed = self.server.draw()
+        if delay:
+            threading.Event().wait(delay)
+        if failed and not self.server.error_status:
+            self.close_connection = True
+            return
+        if failed:
+            self._reply(self.server.error_status, "text/plain", b"injected error")
+            return
+        found = self.server.archive.get(self.path[1:])
+        if found is None:
+            self.server.miss()
+            self._reply(404, "text/plain", b"not recorded")
+        else:
+            self._reply(*found)
+
+    def log_message(self, *args):
+        pass
+
+
+def crawl(topics=None):
+
+    """Run munger.load_or_refresh_ag in an empty scratch directory, so no
+    cached topics, headlines or pickle cut the crawl short.
+
+    The Aggregator's Selenium fallback is off for the crawl: it would go
+    around httpclient to the live sites. A failed topic list raises, and
+    failed topics are skipped.
+
+    RETURNS: the Aggregator
+    """
+
+    # pylint: disable=import-outside-toplevel
+    # munger loads the spaCy model on import
+    from munger import load_or_refresh_ag
+    from scrapers import Aggregator
+
+    cwd = os.getcwd()
+    fallback = Aggregator.selenium_fallback
+    Aggregator.selenium_fallback = False
+    with tempfile.TemporaryDirectory() as scratch:
+        os.makedirs(os.path.join(scratch, "tmp"))
+        os.chdir(scratch)
+        try:
+            return load_or_refresh_ag(topics)
+        finally:
+            os.chdir(cwd)
+            Aggregator.selenium_fallback = fallback
+
+
+if __name__ == "__main__":
+
+    args = parser.parse_args()
+    if args.mode == "record":
+        archive = Archive(os.path.abspath(args.archive))
+        httpclient.record(archive)
+        try:
+            crawl()
+        finally:
+            httpclient.record(None)
+        print(archive)
+    else:
+        server = ReplayServer(
+            args.archive,
+            (args.host, args.port),
+            latency=args.latency,
+            jitter=args.jitter,
+            error_rate=args.errors,
+            error_status=args.status,
+        )
+        print("Replaying {} on {}/".format(server.archive, server.url))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+            print(server)
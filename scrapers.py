@@ -5,17 +5,183 @@
 
 import os
 import re
+import signal
+import socket
+import codecs
+import threading
+import subprocess
+import xml.etree.ElementTree as ET
 import time
 import json
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.firefox.options import Options
-from helpers import kill_firefox, fix_double_quotes
+from html import unescape
+from urllib.parse import unquote, urljoin
+import httpclient
+import metrics
+from helpers import process_group, embedded_json_field, JSON_DECODER
+from wikidump import WikiIndex
+
+# bs4 and selenium are imported where they are used, so code that only
+# reads cached stories never pays for them
+
+ARTICLES = metrics.counter(
+    "ap_articles_total",
+    "AP articles fetched, by topic and outcome",
+    ["topic", "outcome"],
+)
+WIKI_LOOKUPS = metrics.histogram(
+    "wiki_lookup_seconds",
+    "Seconds to a Wikipedia lead's heading; source index is a cache hit",
+    ["source"],
+)
+PAGE_LOADS = metrics.histogram(
+    "selenium_page_load_seconds", "Seconds per Selenium page load", ["scraper"]
+)
+
+
+def make_soup(markup, **strainer):
+
+    """Parse HTML with bs4's html.parser; strainer keyword arguments, if
+    any, build a SoupStrainer so only matching elements are parsed
+    """
+
+    # pylint: disable=import-outside-toplevel
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    parse_only = SoupStrainer(**strainer) if strainer else None
+
+    return BeautifulSoup(markup, "html.parser", parse_only=parse_only)
+
 
 ### Bs4 based scrapers ###
 
 
+class WikiLead:
+
+    """The streamed lead section of a Wikipedia article.
+
+    Only the <h1> and the <p> elements containing bold text are parsed, and
+    the download stops as soon as the caller stops asking for paragraphs.
+    """
+
+    h1_pattern = re.compile(r"<h1[\s>].*?</h1>", flags=re.DOTALL)
+    p_pattern = re.compile(r"<p[\s>].*?</p>", flags=re.DOTALL)
+
+    # A wikidump.WikiIndex to serve leads from before going to the network
+    index = None
+    offline = False
+
+    def __init__(self, url, chunk_size=16384):
+
+        """Find the lead in the local index, or open the response and read up
+        to the page heading
+        """
+
+        self.url = url
+        self.heading = None
+        self.bytes_read = 0
+        self._buffer = ""
+        self._record = None
+        self._response = None
+        start = time.perf_counter()
+        if self.index is not None:
+            self._record = self.index.get(unquote(url.rstrip("/").split("/")[-1]))
+        if self._record and not self._record["bold"]:
+            # An abstract that doesn't open with the title has no bold name
+            # for the scrapers to read; the live page will
+            self._record = None
+        if self._record:
+            self.status_code = 200
+            self.heading = self._record["title"]
+            source = "index"
+        elif self.offline:
+            self.status_code = 404
+            source = "offline"
+        else:
+            source = "network"
+            self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            self._response = httpclient.get(url, stream=True)
+            self._chunks = self._response.iter_content(chunk_size)
+            self.status_code = self._response.status_code
+            if self.status_code == 200:
+                self._read_heading()
+            else:
+                self.close()
+        WIKI_LOOKUPS.observe(time.perf_counter() - start, source=source)
+
+    @classmethod
+    def use_index(cls, prefix, offline=False):
+
+        """Serve lookups from a local lead paragraph index built by wikidump.py
+
+        ARGS:
+            prefix (required) path prefix of the index files
+            offline (optional) never fall back to wikipedia.org; DEFAULT: False
+        """
+
+        cls.index = WikiIndex(prefix)
+        cls.offline = offline
+
+    def _read_more(self):
+
+        """Append the next chunk to the buffer; False once the page is read """
+
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self.close()
+            return False
+        self.bytes_read += len(chunk)
+        self._buffer += self._decoder.decode(chunk)
+
+        return True
+
+    def _read_heading(self):
+
+        """Read until the <h1> is complete and keep its text """
+
+        while True:
+            match = self.h1_pattern.search(self._buffer)
+            if match:
+                self.heading = make_soup(match[0]).h1.text
+                self._buffer = self._buffer[match.end() :]
+                return
+            if not self._read_more():
+                return
+
+    def paragraphs(self):
+
+        """Yield each <p> element that contains bold text, reading as needed """
+
+        if self._record:
+            yield make_soup(self._record["html"]).p
+            return
+        try:
+            while True:
+                match = self.p_pattern.search(self._buffer)
+                if match:
+                    self._buffer = self._buffer[match.end() :]
+                    if "<b>" in match[0] or "<b " in match[0]:
+                        yield make_soup(match[0]).p
+                    continue
+                start = self._buffer.find("<p")
+                self._buffer = self._buffer[start:] if start >= 0 else ""
+                if not self._read_more():
+                    return
+        finally:
+            self.close()
+
+    def close(self):
+
+        """Stop the download and release the connection """
+
+        if self._response is not None:
+            self.bytes_read += httpclient.release(self._response)
+            self._response = None
+
+    def __repr__(self):
+        return "<WikiLead {}: {} bytes read>".format(self.url, self.bytes_read)
+
+
 class WikiPerson:
 
     """Information about a person entity gleaned from Wikipedia """
@@ -29,15 +195,14 @@ class WikiPerson:
             self.url = "https://wikipedia.org/wiki/{}".format(
                 re.sub(r"\s+", "_", name_or_url)
             )
-        request = requests.get(self.url)
+        lead = WikiLead(self.url)
         self.found = False
         self.canonical_name = None
         self.bio = None
 
-        if request.status_code == 200:
-            soup = BeautifulSoup(request.text, "html.parser")
-            self.canonical_name = soup.find("h1").text
-            for element in soup.findAll("p"):
+        if lead.status_code == 200:
+            self.canonical_name = lead.heading
+            for element in lead.paragraphs():
                 bold = [b.text for b in element.findAll("b")]
                 if bold:
                     self.found = True
@@ -45,7 +210,7 @@ class WikiPerson:
                     if self.canonical_name not in bold:
                         self.canonical_name = bold[0]
                     break
-            del soup
+            lead.close()
 
     @property
     def full_name(self):
@@ -103,12 +268,11 @@ class WikiOrg:
         self.found = False
         self.description = None
 
-        request = requests.get(self.url)
+        lead = WikiLead(self.url)
 
-        if request.status_code == 200:
-            soup = BeautifulSoup(request.text, "html.parser")
-            self.canonical_name = soup.find("h1").text
-            for element in soup.findAll("p"):
+        if lead.status_code == 200:
+            self.canonical_name = lead.heading
+            for element in lead.paragraphs():
                 self.bold = [b.text for b in element.findAll("b")]
                 if self.canonical_name and self.canonical_name in self.bold:
                     self.found = True
@@ -119,8 +283,7 @@ class WikiOrg:
                     except IndexError:
                         pass
                     break
-
-            del soup
+            lead.close()
 
     def __repr__(self):
         return "<WikiOrg {}>".format(self.canonical_name)
@@ -153,24 +316,22 @@ class WikiGPE:
         self.found = False
         self.description = None
 
-        request = requests.get(self.url)
-        if request.status_code == 200:
-            soup = BeautifulSoup(request.text, "html.parser")
-            self.canonical_name = soup.find("h1").text
-            for element in enumerate(soup.findAll("p")):
-                bold = [b.text for b in element.findAll("b")]
-                if self.canonical_name and self.canonical_name in bold:
+        lead = WikiLead(self.url)
+        if lead.status_code == 200:
+            self.canonical_name = lead.heading
+            for element in lead.paragraphs():
+                self.bold = [b.text for b in element.findAll("b")]
+                if self.canonical_name and self.canonical_name in self.bold:
                     self.found = True
                     self.description = element
                     try:
-                        if re.search(r"^[A-Z\.]+", bold[1]):
-                            self.abbr = bold[1]
+                        if re.search(r"^[A-Z\.]+", self.bold[1]):
+                            self.abbr = self.bold[1]
                     except IndexError:
                         pass
 
                     break
-
-            del soup
+            lead.close()
 
     def __repr__(self):
         return "<WikiGPE {}>".format(self.canonical_name)
@@ -180,47 +341,97 @@ class APArticle:
 
     """ AP Article contents fetched and scraped from the specified url."""
 
-    def __init__(self, url):
+    title_pattern = re.compile(r"<title[^>]*>(.*?)</title>", flags=re.DOTALL)
+
+    def __init__(self, url, html=None, fast=True):
 
         """Fetch and scrape news article
 
         ARGS:
             url (required)
+            html (optional) previously saved page source; skips the request
+            fast (optional) read the page's embedded JSON payload instead of
+                soup-parsing the whole document; DEFAULT: True
         """
         self.url = url
         self._title = None
         self._byline = None
         self._timestamp = None
         self._content = None
-        request = requests.get(url)
-        if request.status_code == 200:
+        if html is None:
+            request = httpclient.get(url)
+            if request.status_code == 200:
+                html = request.text
+        if html is not None:
             print("Article page loaded from {}".format(self.url))
-            by_pat = re.compile(r"bylines")
-            time_pat = re.compile(r"timestamp", flags=re.IGNORECASE)
-            story_pat = re.compile(
-                r"^.*?storyHTML\"\:\"\\+u003cp>(.*)\}?", flags=re.MULTILINE
-            )
-            soup = BeautifulSoup(request.text, "html.parser")
-            self._title = soup.find("title").text
-            for span in (s for s in soup.find_all("span") if "class" in s.attrs):
-                for class_name in span.attrs["class"]:
-                    if by_pat.search(class_name):
-                        self._byline = span.text
-                    if time_pat.search(class_name):
-                        self._timestamp = span.attrs["data-source"]
+            if not (fast and self.extract_json(html)):
+                self.extract_soup(html)
             print("Title: {}".format(self._title))
             print("Byline: {}".format(self._byline))
 
-            story_html = re.sub(r"\\+u003c", "<", story_pat.search(request.text)[1])
-            story_html = re.sub(r"\\+", "", story_html)
-            soup = BeautifulSoup(story_html, "html.parser")
-            paragraphs = [fix_double_quotes(p.text) for p in soup.find_all("p")]
+    def extract_json(self, html):
+
+        """Read the story and its metadata from the embedded JSON payload.
 
-            end = sorted([p for p in paragraphs if re.match(r"^_+$", p)], key=len)[0]
-            self._content = {
-                "html": story_html,
-                "text": "\n".join(paragraphs[: paragraphs.index(end)]),
-            }
+        RETURNS: False if the page has no decodable storyHTML field
+        """
+
+        story_html = embedded_json_field(html, "storyHTML")
+        if not isinstance(story_html, str):
+            return False
+        title = self.title_pattern.search(html)
+        if title:
+            self._title = unescape(title[1]).strip()
+        else:
+            self._title = embedded_json_field(html, "headline")
+        self._byline = embedded_json_field(html, "bylines")
+        self._timestamp = embedded_json_field(html, "published")
+        self._parse_story(story_html)
+
+        return True
+
+    def extract_soup(self, html):
+
+        """Scrape the story and its metadata from the fully parsed page.
+
+        RETURNS: False if the page has no storyHTML field
+        """
+
+        by_pat = re.compile(r"bylines")
+        time_pat = re.compile(r"timestamp", flags=re.IGNORECASE)
+        story_pat = re.compile(
+            r"^.*?storyHTML\"\:\"\\+u003cp>(.*)\}?", flags=re.MULTILINE
+        )
+        soup = make_soup(html)
+        self._title = soup.find("title").text
+        for span in (s for s in soup.find_all("span") if "class" in s.attrs):
+            for class_name in span.attrs["class"]:
+                if by_pat.search(class_name):
+                    self._byline = span.text
+                if time_pat.search(class_name):
+                    self._timestamp = span.attrs["data-source"]
+
+        story = story_pat.search(html)
+        if story is None:
+            print("No story found at {}".format(self.url))
+            return False
+        story_html = re.sub(r"\\+u003c", "<", story[1])
+        story_html = re.sub(r"\\+", "", story_html)
+        self._parse_story("<p>" + story_html)
+
+        return True
+
+    def _parse_story(self, story_html):
+
+        """Collect paragraph text, parsing only the <p> elements of the story """
+
+        soup = make_soup(story_html, name="p")
+        paragraphs = [p.text for p in soup.find_all("p")]
+        # Quotes, datelines and bottoms are handled by helpers.normalize_text
+        self._content = {
+            "html": story_html,
+            "text": "\n".join(paragraphs),
+        }
 
     @property
     def title(self):
@@ -251,30 +462,377 @@ class APArticle:
         )
 
 
-### Selenium based scrapers ###
+class APHub:
 
+    """AP News topics and topic headlines read over plain HTTP.
 
-class HeavyScraper:
+    A light-weight alternative to APHeadlines: hub pages are fetched with
+    requests, and headlines are read from the page's embedded JSON state,
+    or failing that from its server-rendered FeedCard elements. Raises
+    ValueError when a page yields nothing, so callers can fall back to
+    the Selenium scraper.
+    """
 
-    """A resource intensive, selemium-based Soup-Nazi countermeasure
+    # pylint: disable=too-few-public-methods
+    # These scrapers are meant to be instantiated once and discarded
 
-    (Base class for scrapers requiring gekodriver instead of Beautiful Soup)
+    url = "https://apnews.com/"
+    state_pattern = re.compile(r"window\[.titanium-state.\]\s*=\s*")
+    topics_class = re.compile(r"(^|\s)TopicsDropdown(\s|$)")
+    card_class = re.compile(r"(^|\s)FeedCard(\s|$)")
+
+    def __init__(self, topic_id=0):
+
+        """Fetch topics and, if topic_id is supplied, that topic's headlines """
+
+        self.topic_list = []
+        self.headlines = []
+        self.links = {}
+        for index, name, href in self.parse_topics(self._get(self.url)):
+            self.topic_list.append((index, name))
+            self.links[index] = (name, href)
+        if not self.topic_list:
+            raise ValueError("No AP topics found at {}".format(self.url))
+
+        if topic_id > 0:
+            name, href = self.links[topic_id]
+            self.url = urljoin(self.url, href)
+            self.headlines = self.topic_headlines(name, href)
+
+    @classmethod
+    def topic_headlines(cls, name, href):
+
+        """Fetch one topic's hub page, linked from the topics dropdown, and
+        return its headlines
+        """
+
+        url = urljoin(cls.url, href)
+        headlines = cls.parse_headlines(cls._get(url), name)
+        if not headlines:
+            raise ValueError("No AP headlines found at {}".format(url))
+
+        return headlines
+
+    @staticmethod
+    def _get(url):
+
+        """Return the page source, raising for anything but 200 """
+
+        request = httpclient.get(url)
+        request.raise_for_status()
+
+        return request.text
+
+    @classmethod
+    def parse_topics(cls, html):
+
+        """Return (index, name, href) for each entry of the topics dropdown """
+
+        soup = make_soup(html, class_=cls.topics_class)
+        topics = []
+        for index, item in enumerate(soup.find_all("li")):
+            link = item.find("a")
+            if index > 0 and link and link.get("href"):
+                topics.append((index, item.text.strip(), link["href"]))
+
+        return topics
+
+    @classmethod
+    def parse_headlines(cls, html, topic):
+
+        """Return (topic, href, text) for each story card on a hub page """
+
+        headlines = []
+        match = cls.state_pattern.search(html)
+        if match:
+            try:
+                state = JSON_DECODER.raw_decode(html, match.end())[0]
+            except ValueError:
+                state = None
+            for card in cls._cards(state):
+                href = urljoin(cls.url, card["localLinkUrl"])
+                if href not in [h[1] for h in headlines]:
+                    headlines.append((topic, href, card["headline"]))
+        if headlines:
+            return headlines
+
+        soup = make_soup(html, class_=cls.card_class)
+        for card in soup.find_all(class_=cls.card_class):
+            link = card.find("a")
+            if link and link.get("href"):
+                text = card.get_text("\n", strip=True)
+                headlines.append((topic, urljoin(cls.url, link["href"]), text))
+
+        return headlines
+
+    @classmethod
+    def _cards(cls, node):
+
+        """Yield every dict in the state that has a headline and a link """
+
+        if isinstance(node, dict):
+            if node.get("headline") and node.get("localLinkUrl"):
+                yield node
+            for value in node.values():
+                yield from cls._cards(value)
+        elif isinstance(node, list):
+            for value in node:
+                yield from cls._cards(value)
+
+    def __repr__(self):
+        return "<APHub object: url={}>".format(self.url)
+
+
+class TrendsFeed:
+
+    """Top Google Search terms read from the Google Trends RSS feed.
+
+    A browser-free alternative to Trends with the same trends and ngrams
+    properties; cheap enough to refresh every few minutes.
     """
 
     # pylint: disable=too-few-public-methods
     # These scrapers are meant to be instantiated once and discarded
 
-    def __init__(self, url=None):
+    url = "https://trends.google.com/trending/rss?geo=US"
 
-        """ARGS: url ; DEFAULT: None """
+    def __init__(self, url=None, xml=None):
+
+        """Fetch and parse the feed, or parse previously saved feed xml """
+
+        if url:
+            self.url = url
+        if xml is None:
+            request = httpclient.get(self.url)
+            request.raise_for_status()
+            xml = request.content
+        self._trends = self.parse_feed(xml)
+
+    @staticmethod
+    def parse_feed(xml):
+
+        """Return a (term, traffic, related) tuple for each feed item.
+
+        The related element is the title of the first linked news story.
+        Namespaces are ignored, since the feed has changed them over time.
+        """
+
+        trends = []
+        for item in ET.fromstring(xml).iter("item"):
+            fields = {}
+            for elem in item.iter():
+                tag = elem.tag.rsplit("}", 1)[-1]
+                if tag not in fields and elem.text and elem.text.strip():
+                    fields[tag] = elem.text.strip()
+            if "title" in fields:
+                trends.append(
+                    (
+                        fields["title"],
+                        fields.get("approx_traffic"),
+                        fields.get("news_item_title"),
+                    )
+                )
+
+        return trends
+
+    @property
+    def trends(self):
+        """List of (term, traffic, related) tuples from the feed """
+        return self._trends
+
+    @property
+    def ngrams(self):
+        """Trending colocations fro google searches """
+        return [n[0] for n in self._trends]
+
+    def __repr__(self):
+        return "<TrendsFeed object: url={}>".format(self.url)
+
+
+### Selenium based scrapers ###
+
+
+class BrowserSupervisor:
+
+    """A headless Firefox that only ever cleans up after itself.
+
+    The geckodriver is started in a session of its own, so it and every
+    process it spawns (the browser, even once reparented) share its process
+    group. On quit whatever is still in that group is killed, which lets
+    several scrapers run side by side without touching each other's, or
+    anyone else's, browsers. A watchdog thread kills the session once it
+    outlives session_timeout seconds or its processes exceed memory_limit MiB.
+    """
+
+    def __init__(
+        self, page_timeout=60, session_timeout=600, memory_limit=2048, poll=2
+    ):
+
+        """ARGS: page_timeout, session_timeout (seconds), memory_limit (MiB),
+        poll (watchdog interval in seconds)
+        """
+
+        self.page_timeout = page_timeout
+        self.session_timeout = session_timeout
+        self.memory_limit = memory_limit
+        self.poll = poll
+        self.driver = None
+        self.pid = None
+        self.killed = None
+        self._process = None
+        self._started = None
+        self._done = threading.Event()
+
+    def _launch(self, timeout=30):
+
+        """Start geckodriver as the leader of a new session; RETURNS its url
+
+        Selenium's own Service can't be told to do this (Selenium 3), so the
+        driver is attached to with webdriver.Remote instead.
+        """
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self._process = subprocess.Popen(
+            ["geckodriver", "--port", str(port)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        self.pid = self._process.pid
+        deadline = time.monotonic() + timeout
+        while self._process.poll() is None and time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                return "http://127.0.0.1:{}".format(port)
+            except OSError:
+                time.sleep(0.1)
+        self._reap()
+        raise RuntimeError("geckodriver did not start")
+
+    def start(self):
+
+        """Launch the browser and its watchdog; return the webdriver """
+
+        # pylint: disable=import-outside-toplevel
+        from selenium import webdriver
+        from selenium.webdriver.firefox.options import Options
 
-        self.url = url
         options = Options()
         options.headless = True
         options.add_argument("--window-size=1920,1200")
         options.add_argument("--incognito")
-        self.driver = webdriver.Firefox(options=options)
+        url = self._launch()
+        try:
+            self.driver = webdriver.Remote(command_executor=url, options=options)
+        except Exception:
+            self._reap()
+            raise
         self.driver.implicitly_wait(3)
+        self.driver.set_page_load_timeout(self.page_timeout)
+        self._started = time.monotonic()
+        threading.Thread(target=self._watch, daemon=True).start()
+
+        return self.driver
+
+    @property
+    def memory(self):
+
+        """Resident memory of the driver and browser processes in MiB """
+
+        return sum(process_group(self.pid).values()) / 1024 if self.pid else 0
+
+    def _watch(self):
+
+        """Kill the session when it runs too long or grows too large """
+
+        while not self._done.wait(self.poll):
+            if time.monotonic() - self._started > self.session_timeout:
+                self.kill("session timeout")
+            elif self.memory > self.memory_limit:
+                self.kill("memory limit")
+
+    def _reap(self):
+
+        """SIGKILL what is left of the process group, then wait for the driver
+
+        The group id is the driver's pid, which stays reserved until the
+        driver is waited for and the last member exits, so only our own
+        leftovers can be signalled.
+        """
+
+        if process_group(self.pid):
+            try:
+                os.killpg(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        try:
+            self._process.wait(timeout=self.poll)
+        except subprocess.TimeoutExpired:
+            pass
+        self.pid = None
+
+    def kill(self, reason="killed"):
+
+        """SIGKILL the driver and every process it spawned """
+
+        self._done.set()
+        self.killed = self.killed or reason
+        if self.pid:
+            self._reap()
+
+    def quit(self):
+
+        """Close the browser politely, then reap anything left over """
+
+        self._done.set()
+        if not self.pid:
+            return
+        try:
+            # pylint: disable=broad-except
+            # A dead or hung browser can fail in many ways; it is killed below
+            self.driver.quit()
+            self._process.terminate()
+            self._process.wait(timeout=self.poll)
+        except Exception as err:
+            print("Browser did not quit cleanly: {}".format(err))
+        self._reap()
+
+    def __repr__(self):
+        return "<BrowserSupervisor pid={}: {}>".format(self.pid, self.killed)
+
+
+class HeavyScraper:
+
+    """A resource intensive, selemium-based Soup-Nazi countermeasure
+
+    (Base class for scrapers requiring gekodriver instead of Beautiful Soup)
+    """
+
+    # pylint: disable=too-few-public-methods
+    # These scrapers are meant to be instantiated once and discarded
+
+    def __init__(self, url=None, supervisor=None):
+
+        """ARGS: url, supervisor (BrowserSupervisor) ; DEFAULT: None """
+
+        self.url = url
+        self.supervisor = supervisor or BrowserSupervisor()
+        self.driver = self.supervisor.start()
+
+    def load(self, url):
+
+        """Point the browser at url, timing the page load """
+
+        with PAGE_LOADS.time(scraper=type(self).__name__):
+            self.driver.get(url)
+
+    def close(self):
+
+        """Quit the browser and reap its processes """
+
+        self.supervisor.quit()
 
     def __repr__(self):
         return "<HeavyScraper object: url={}>".format(self.url)
@@ -290,19 +848,18 @@ class Trends(HeavyScraper):
 
         """ Fetch search terms and immediately close the marionette driver"""
         super().__init__(self.url)
-        self.driver.get(self.url)
-        self._trends = [
-            (
-                topic.text.split("\n")[1],
-                topic.text.split("\n")[2],
-                topic.text.split("\n")[6],
-            )
-            for topic in self.driver.find_elements_by_class_name("feed-item")
-        ]
-        self.driver.close()
-        self.driver.quit()
-        kill_firefox()
-        del self.driver
+        try:
+            self.load(self.url)
+            self._trends = [
+                (
+                    topic.text.split("\n")[1],
+                    topic.text.split("\n")[2],
+                    topic.text.split("\n")[6],
+                )
+                for topic in self.driver.find_elements_by_class_name("feed-item")
+            ]
+        finally:
+            self.close()
 
     @property
     def trends(self):
@@ -336,52 +893,54 @@ class APHeadlines(HeavyScraper):
         topic are also retrieved before closing the marionette driver.
         """
         super().__init__(self.url)
-        self.driver.get(self.url)
         self.headlines = []
-        self.ap_nav = self.driver.find_elements_by_class_name("nav-action")
-        print("Got AP Nav")
-        time.sleep(3)
-        self.ap_nav[1].click()
-        time.sleep(3)
-        self.topic_nav = self.driver.find_element_by_class_name(
-            "TopicsDropdown"
-        ).find_elements_by_tag_name("li")
-        # create_topic_list
-        for index, element in enumerate(self.topic_nav):
-            if index > 0:
-                self.topic_list.append((index, element.text))
-
-        if topic_id > 0:
-            topic = self.topic_nav[topic_id]
+        try:
+            self.load(self.url)
+            self.ap_nav = self.driver.find_elements_by_class_name("nav-action")
+            print("Got AP Nav")
             time.sleep(3)
-            if not topic.find_element_by_tag_name("a").is_displayed():
-                self.ap_nav[1].click()
-                time.sleep(1)
-            print(
-                "Navigating to {}".format(
-                    topic.find_element_by_tag_name("a").get_attribute("href")
-                )
-            )
-            topic.find_element_by_tag_name("a").click()
+            self.ap_nav[1].click()
             time.sleep(3)
-            self.url = self.driver.current_url
-            print("{} is loaded; retrieving headlines ...".format(self.url))
-            stories = self.driver.find_elements_by_class_name("FeedCard")
-            for story in stories:
-                try:
-                    # pylint: disable=broad-except
-                    # These are triggered by ads and countermeasures
-                    # no need to handle; note them and move on
-                    if story.location_once_scrolled_into_view:
-                        txt = story.text
-                        href = story.find_element_by_tag_name("a").get_attribute("href")
-                        self.headlines.append((self.driver.title, href, txt))
-                except Exception as err:
-                    print(f"Failed to load headline:\n{err}")
-
-        self.driver.close()
-        self.driver.quit()
-        kill_firefox()
+            self.topic_nav = self.driver.find_element_by_class_name(
+                "TopicsDropdown"
+            ).find_elements_by_tag_name("li")
+            # create_topic_list
+            for index, element in enumerate(self.topic_nav):
+                if index > 0:
+                    self.topic_list.append((index, element.text))
+
+            if topic_id > 0:
+                topic = self.topic_nav[topic_id]
+                time.sleep(3)
+                if not topic.find_element_by_tag_name("a").is_displayed():
+                    self.ap_nav[1].click()
+                    time.sleep(1)
+                print(
+                    "Navigating to {}".format(
+                        topic.find_element_by_tag_name("a").get_attribute("href")
+                    )
+                )
+                with PAGE_LOADS.time(scraper=type(self).__name__):
+                    topic.find_element_by_tag_name("a").click()
+                time.sleep(3)
+                self.url = self.driver.current_url
+                print("{} is loaded; retrieving headlines ...".format(self.url))
+                stories = self.driver.find_elements_by_class_name("FeedCard")
+                for story in stories:
+                    try:
+                        # pylint: disable=broad-except
+                        # These are triggered by ads and countermeasures
+                        # no need to handle; note them and move on
+                        if story.location_once_scrolled_into_view:
+                            txt = story.text
+                            href = story.find_element_by_tag_name("a").get_attribute(
+                                "href"
+                            )
+                            self.headlines.append((self.driver.title, href, txt))
+                    except Exception as err:
+                        print(f"Failed to load headline:\n{err}")
+        finally:
+            self.close()
 
     def __repr__(self):
         return "<APHeadlines object: url={}>".format(self.url)
@@ -391,12 +950,17 @@ class Aggregator:
 
     """ Collect News Headlines and Stories  """
 
+    # False re-raises APHub failures instead of starting Selenium, which
+    # bypasses httpclient (and so any replay server)
+    selenium_fallback = True
+
     def __init__(self):
         """ Delcare private vars and retrieve the topic list  """
 
         self._topics = []
         self._headlines = []
         self._stories = []
+        self._links = None
         if os.path.isfile("topics.json"):
             self.restore_ap_topics()
         else:
@@ -405,7 +969,16 @@ class Aggregator:
     def refresh_ap_topics(self):
         """ Collects the list of AP News topics and caches it """
 
-        headlines = APHeadlines()
+        try:
+            # pylint: disable=broad-except
+            # Any failure of the light-weight scraper means using Selenium
+            headlines = APHub()
+            self._links = headlines.links
+        except Exception as ex:
+            if not self.selenium_fallback:
+                raise
+            print("Falling back to Selenium for AP topics: {}".format(ex))
+            headlines = APHeadlines()
         self._topics = headlines.topic_list
         self.cache_ap_topics()
 
@@ -428,22 +1001,58 @@ class Aggregator:
         """
 
         self._headlines = []
+        links = self.topic_links()
         for topic in self._topics:
             try:
                 # pylint: disable=broad-except
                 # These are triggered by ads and countermeasures
                 # no need to handle; note them and move on
-                top = APHeadlines(topic[0])
-                self._headlines.extend(top.headlines)
+                self._headlines.extend(
+                    self.fetch_topic_headlines(topic[0], links.get(topic[0]))
+                )
             except Exception as ex:
                 print(ex)
-                kill_firefox()
                 time.sleep(3)
                 continue
 
         self.cache_headlines()
         return self._headlines
 
+    def topic_links(self):
+        """ {topic id: (name, href)} read once from the AP homepage; {} if
+        it can't be read, so each topic is looked up on its own
+        """
+
+        if self._links is None:
+            try:
+                # pylint: disable=broad-except
+                # Without the links each topic resolves its own
+                self._links = APHub().links
+            except Exception as ex:
+                print("Can't read AP topic links: {}".format(ex))
+                self._links = {}
+        return self._links
+
+    @classmethod
+    def fetch_topic_headlines(cls, topic_id, link=None):
+        """ Returns a topic's headlines, using Selenium only if HTTP fails
+
+        ARGS: topic_id; link (optional) the topic's (name, href), which
+        saves fetching the homepage to find it
+        """
+
+        try:
+            # pylint: disable=broad-except
+            # Any failure of the light-weight scraper means using Selenium
+            if link:
+                return APHub.topic_headlines(*link)
+            return APHub(topic_id).headlines
+        except Exception as ex:
+            if not cls.selenium_fallback:
+                raise
+            print("Falling back to Selenium for topic {}: {}".format(topic_id, ex))
+        return APHeadlines(topic_id).headlines
+
     def cache_headlines(self):
         """ Dumps self._headlines to json file  """
 
@@ -461,10 +1070,10 @@ class Aggregator:
         except IOError as err:
             print("Can't read from 'headlines.json': {}".format(err))
 
-    def fetch_ap_article(self, url):
+    def fetch_ap_article(self, url, topic=None):
         """ Fetches a new APArticle and appends its content to stories
 
-        ARGS: url
+        ARGS: url, topic (optional) labels the ap_articles_total metric
 
         """
 
@@ -474,11 +1083,15 @@ class Aggregator:
                 # These are triggered by ads and countermeasures
                 # no need to handle; note them and move on
                 article = APArticle(url)
-                self._stories.append(article)
             except Exception as ex:
-                kill_firefox()
+                ARTICLES.inc(topic=topic, outcome="failed")
                 time.sleep(3)
                 print("Unable to retrieve article", ex)
+            else:
+                if article.content:
+                    self._stories.append(article)
+                outcome = "fetched" if article.content else "failed"
+                ARTICLES.inc(topic=topic, outcome=outcome)
 
     @property
     def topics(self):
@@ -0,0 +1,654 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Array-backed sentence tables built once per catalog for the Munger. """
+
+import random
+import numpy as np
+
+CURLY_QUOTES = ("“", "”")
+SPEAKER_DEPS = ("nsubj", "nsubjpass")
+
+
+def quote_spans(sent):
+
+    """Pair the curly quotes of a sentence (a spaCy Span).
+
+    Returns a list of (left, right, verb, speaker, matched) tuples of token
+    offsets within the sentence: the quoted text is sent[left + 1 : right].
+    An unmatched opening quote runs to the next quote or the sentence end
+    (right == len(sent)); an unmatched closing quote runs back to the last
+    quote or the sentence start (left == -1). verb is the token outside the
+    quote that the quoted text attaches to, speaker its subject; -1 if none.
+    """
+
+    found = []
+    left = None
+    floor = -1
+    for k, token in enumerate(sent):
+        if token.orth_ == CURLY_QUOTES[0]:
+            if left is not None:
+                found.append((left, k, False))
+            left = k
+        elif token.orth_ == CURLY_QUOTES[1]:
+            if left is None:
+                found.append((floor, k, False))
+            else:
+                found.append((left, k, True))
+            left = None
+            floor = k
+    if left is not None:
+        found.append((left, len(sent), False))
+
+    return [
+        (left, right) + quote_attachment(sent, left + 1, right) + (matched,)
+        for left, right, matched in found
+    ]
+
+
+def quote_attachment(sent, start, end):
+
+    """(verb, speaker) offsets for the quoted tokens sent[start:end] """
+
+    verb = -1
+    for k in range(start, end):
+        head = sent[k].head.i - sent.start
+        if not start <= head < end:
+            verb = head
+            break
+    else:
+        root = sent.root.i - sent.start
+        if not start <= root < end:
+            verb = root
+    if verb < 0:
+        return (-1, -1)
+    speaker = [
+        c.i - sent.start
+        for c in sent[verb].children
+        if c.dep_ in SPEAKER_DEPS and not start <= c.i - sent.start < end
+    ]
+
+    return (verb, speaker[0] if speaker else -1)
+
+
+def requote(sent, spans, texts=None):
+
+    """Rebuild a sentence's text from its quote spans.
+
+    Each span's quoted text is replaced by the matching entry of texts
+    (kept when None), and quotes missing from unmatched spans are added.
+    """
+
+    tokens = [t.text_with_ws for t in sent]
+    text = ""
+    cursor = 0
+    for k, (left, right, *_) in enumerate(spans):
+        text += "".join(tokens[cursor : left + 1])
+        if left < 0 or sent[left].orth_ != CURLY_QUOTES[0]:
+            text += CURLY_QUOTES[0]
+        if texts is None or texts[k] is None:
+            text += "".join(tokens[left + 1 : right])
+        else:
+            text += texts[k]
+        if right >= len(sent):
+            text = text.rstrip() + CURLY_QUOTES[1]
+        elif sent[right].orth_ != CURLY_QUOTES[1]:
+            text = text.rstrip() + CURLY_QUOTES[1] + " "
+        cursor = right
+    text += "".join(tokens[cursor:])
+
+    return text
+
+
+def sentence_matrix(documents):
+
+    """float32 matrix of sentence vectors, one row per sentence """
+
+    vectors = [sent.vector for doc in documents for sent in doc.sents]
+    if not vectors:
+        return np.zeros((0, 1), dtype=np.float32)
+
+    return np.array(vectors, dtype=np.float32)
+
+
+class SentenceVectors:
+
+    """Approximate nearest-neighbour index over sentence vectors.
+
+    Sentences are stored as rows of a unit-normalized float32 matrix, and
+    hashed into random-projection LSH tables.
+    A query scores only the sentences that share a bucket with it (and,
+    optionally, its root lemma) and falls back to scoring the whole lemma
+    group when the buckets come up short.
+    """
+
+    def __init__(
+        self, vectors, doc_ids, sent_ids, lemmas, n_bits=None, n_tables=8, seed=0
+    ):
+
+        """ARGS: vectors (n x d), doc_ids, sent_ids and root lemmas (n each);
+        n_bits DEFAULT: enough for roughly 32 sentences per bucket
+        """
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        self.vectors = vectors / norms
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        self.sent_ids = np.asarray(sent_ids, dtype=np.int32)
+        self.lemma_ids = {}
+        self.lemmas = np.array(
+            [self.lemma_ids.setdefault(lemma, len(self.lemma_ids)) for lemma in lemmas],
+            dtype=np.int32,
+        )
+        self._rows = {ids: row for row, ids in enumerate(zip(doc_ids, sent_ids))}
+        self._groups = {
+            lemma_id: np.flatnonzero(self.lemmas == lemma_id)
+            for lemma_id in self.lemma_ids.values()
+        }
+
+        if n_bits is None:
+            n_bits = max(4, min(24, int(np.log2(max(len(self.vectors), 1) / 32))))
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal(
+            (n_tables, n_bits, self.vectors.shape[1])
+        ).astype(np.float32)
+        self._weights = (1 << np.arange(n_bits)).astype(np.int64)
+        self._tables = []
+        for codes in self._hash(self.vectors):
+            order = np.argsort(codes, kind="stable")
+            keys, starts = np.unique(codes[order], return_index=True)
+            self._tables.append(
+                dict(zip(keys.tolist(), np.split(order, starts[1:])))
+            )
+
+    @classmethod
+    def from_documents(cls, documents, **kwargs):
+
+        """Index every sentence of every spaCy Doc """
+
+        doc_ids, sent_ids, lemmas = [], [], []
+        for i, doc in enumerate(documents):
+            for j, sent in enumerate(doc.sents):
+                doc_ids.append(i)
+                sent_ids.append(j)
+                lemmas.append(sent.root.lemma_)
+
+        return cls(sentence_matrix(documents), doc_ids, sent_ids, lemmas, **kwargs)
+
+    def _hash(self, vectors):
+
+        """LSH codes for each table: (n_tables, n) integer array """
+
+        bits = np.einsum("tbd,nd->tnb", self._planes, vectors) > 0
+
+        return bits.astype(np.int64) @ self._weights
+
+    def similar(self, vector, k=5, lemma=None, exclude=(), within=None):
+
+        """Return up to k (doc, sent) ids of the sentences most like vector.
+
+        ARGS:
+            vector (required) query vector, eg. span.vector
+            k (optional) number of neighbours; DEFAULT: 5
+            lemma (optional) only consider sentences with this root lemma
+            exclude (optional) (doc, sent) ids to leave out
+            within (optional) sorted row numbers to restrict the search to
+        """
+
+        if lemma is not None and lemma not in self.lemma_ids:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        codes = self._hash(query[np.newaxis, :])[:, 0]
+        buckets = [
+            table[code]
+            for table, code in zip(self._tables, codes.tolist())
+            if code in table
+        ]
+        if buckets:
+            candidates = np.unique(np.concatenate(buckets))
+        else:
+            candidates = np.array([], dtype=np.int64)
+        group = np.arange(len(self.vectors))
+        if lemma is not None:
+            group = self._groups[self.lemma_ids[lemma]]
+        if within is not None:
+            group = np.intersect1d(group, within, assume_unique=True)
+        candidates = np.intersect1d(candidates, group, assume_unique=True)
+        excluded = [self._rows[e] for e in exclude if e in self._rows]
+        if excluded:
+            candidates = np.setdiff1d(candidates, excluded, assume_unique=True)
+        if len(candidates) < k:
+            candidates = np.setdiff1d(group, excluded, assume_unique=True)
+
+        scores = self.vectors[candidates] @ query
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(candidates))
+        best = candidates[top[np.argsort(-scores[top], kind="stable")]]
+
+        return [(int(self.doc_ids[r]), int(self.sent_ids[r])) for r in best]
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def __repr__(self):
+        return "<SentenceVectors: {} sentences, {} tables>".format(
+            len(self), len(self._tables)
+        )
+
+
+class SentenceTable:
+
+    """Per-sentence feature flags for a catalog, as compact NumPy arrays.
+
+    Row r describes sentence sent_ids[r] of document doc_ids[r], tokens
+    starts[r] to ends[r]; rows run in document, then sentence, order, so
+    row(doc, sent) is a lookup.
+    Flags: has_quotes (any quote token), quote_parity (count of curly
+    quotes mod 2), lemma_ids (root lemma, an index into lemmas) and
+    is_saying (root lemma "say").
+
+    Quote spans (see quote_spans) are kept in one int32 array, five
+    columns wide, with quote_ptr[r]:quote_ptr[r + 1] the rows of sentence r.
+
+    Sentences that are neither sayings nor quoted are eligible for
+    munge_on_roots; those whose root is shared by another eligible
+    sentence are pairable, and can be drawn in constant time.
+    """
+
+    def __init__(self, documents):
+
+        """Scan each spaCy Doc once and build the flag arrays """
+
+        curly = []
+        doc_ids, sent_ids, lemmas, offsets = [], [], [], [0]
+        quotes, curlies, starts, ends = [], [], [], []
+        spans, quote_ptr = [], [0]
+        for i, doc in enumerate(documents):
+            sents = list(doc.sents)
+            offsets.append(offsets[-1] + len(sents))
+            if not sents:
+                continue
+            curly = curly or [doc.vocab.strings[q] for q in CURLY_QUOTES]
+            bounds = np.array([sent.start for sent in sents])
+            quotes.append(np.add.reduceat(doc.to_array("IS_QUOTE"), bounds))
+            is_curly = np.isin(doc.to_array("ORTH"), curly).astype(np.int32)
+            curlies.append(np.add.reduceat(is_curly, bounds))
+            for j, sent in enumerate(sents):
+                if curlies[-1][j]:
+                    spans.extend(quote_spans(sent))
+                quote_ptr.append(len(spans))
+                doc_ids.append(i)
+                sent_ids.append(j)
+                lemmas.append(sent.root.lemma_)
+                starts.append(sent.start)
+                ends.append(sent.end)
+
+        def stack(parts, dtype):
+            return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype)
+
+        self.doc_ids = np.array(doc_ids, dtype=np.int32)
+        self.sent_ids = np.array(sent_ids, dtype=np.int32)
+        self.starts = np.array(starts, dtype=np.int32)
+        self.ends = np.array(ends, dtype=np.int32)
+        self._offsets = np.array(offsets, dtype=np.int64)
+        self.quote_spans = np.array(spans, dtype=np.int32).reshape(-1, 5)
+        self.quote_ptr = np.array(quote_ptr, dtype=np.int64)
+        self.lemmas = sorted(set(lemmas))
+        self.lemma_index = {lemma: n for n, lemma in enumerate(self.lemmas)}
+        self.lemma_ids = np.array(
+            [self.lemma_index[lemma] for lemma in lemmas], dtype=np.int32
+        )
+        self.has_quotes = stack(quotes, bool)
+        self.quote_parity = stack(curlies, np.uint8) % 2
+        self._index()
+
+    @classmethod
+    def merge(cls, tables):
+
+        """Concatenate tables, renumbering documents and root lemmas """
+
+        table = cls.__new__(cls)
+        table.lemmas = sorted(set().union(*[t.lemmas for t in tables]))
+        table.lemma_index = {lemma: n for n, lemma in enumerate(table.lemmas)}
+        doc_base = np.cumsum([0] + [len(t._offsets) - 1 for t in tables])
+        row_base = np.cumsum([0] + [len(t) for t in tables])
+        span_base = np.cumsum([0] + [len(t.quote_spans) for t in tables])
+
+        def join(parts, dtype):
+            return np.concatenate([np.zeros(0, dtype)] + parts).astype(dtype)
+
+        table.doc_ids = join(
+            [t.doc_ids + base for t, base in zip(tables, doc_base)], np.int32
+        )
+        table.lemma_ids = join(
+            [
+                np.array([table.lemma_index[l] for l in t.lemmas], np.int32)[
+                    t.lemma_ids
+                ]
+                for t in tables
+            ],
+            np.int32,
+        )
+        table._offsets = join(
+            [t._offsets[:-1] + base for t, base in zip(tables, row_base)]
+            + [row_base[-1:]],
+            np.int64,
+        )
+        table.quote_ptr = join(
+            [t.quote_ptr[:-1] + base for t, base in zip(tables, span_base)]
+            + [span_base[-1:]],
+            np.int64,
+        )
+        for name, dtype in [
+            ("sent_ids", np.int32),
+            ("starts", np.int32),
+            ("ends", np.int32),
+            ("has_quotes", bool),
+            ("quote_parity", np.uint8),
+        ]:
+            setattr(table, name, join([getattr(t, name) for t in tables], dtype))
+        table.quote_spans = np.concatenate(
+            [np.zeros((0, 5), np.int32)] + [t.quote_spans for t in tables]
+        )
+        table._index()
+
+        return table
+
+    def _index(self):
+
+        """Derive the eligibility flags and lemma groups """
+
+        say = self.lemma_index.get("say", -1)
+        self.is_saying = self.lemma_ids == say
+
+        self.eligible = ~(self.has_quotes | self.is_saying)
+        rows = np.flatnonzero(self.eligible)
+        counts = np.bincount(self.lemma_ids[rows], minlength=len(self.lemmas))
+        self._by_lemma = {
+            self.lemmas[lemma_id]: group
+            for lemma_id, group in enumerate(
+                np.split(
+                    rows[np.argsort(self.lemma_ids[rows], kind="stable")],
+                    np.cumsum(counts)[:-1],
+                )
+            )
+            if len(group)
+        }
+        self.pairable = rows[counts[self.lemma_ids[rows]] > 1]
+
+    def row(self, doc, sent):
+
+        """Row number of sentence sent in document doc """
+
+        return int(self._offsets[doc] + sent)
+
+    def ids(self, row):
+
+        """(doc, sent) ids of a row """
+
+        return int(self.doc_ids[row]), int(self.sent_ids[row])
+
+    def quotes(self, row):
+
+        """Quote spans of a row as (left, right, verb, speaker, matched) """
+
+        return self.quote_spans[self.quote_ptr[row] : self.quote_ptr[row + 1]]
+
+    def eligible_rows(self, lemma=None):
+
+        """Sorted rows eligible for munge_on_roots, optionally by root lemma """
+
+        if lemma is None:
+            return np.flatnonzero(self.eligible)
+
+        return self._by_lemma.get(lemma, np.zeros(0, dtype=np.int64))
+
+    def pick(self, rows, exclude=()):
+
+        """Draw a random row from sorted rows, leaving out excluded ids.
+
+        Uses the random module, so picks follow the caller's seed. Returns
+        None when nothing is left to pick from.
+        """
+
+        skip = np.array(sorted(self.row(*ids) for ids in exclude), dtype=np.int64)
+        skip = skip[np.isin(skip, rows)]
+        if len(skip) > 1:
+            rows, skip = np.setdiff1d(rows, skip, assume_unique=True), skip[:0]
+        if len(rows) <= len(skip):
+            return None
+        n = random.randrange(len(rows) - len(skip))
+        if len(skip) and n >= np.searchsorted(rows, skip[0]):
+            n += 1
+
+        return int(rows[n])
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def __repr__(self):
+        return "<SentenceTable: {} sentences, {} eligible, {} pairable>".format(
+            len(self), int(self.eligible.sum()), len(self.pairable)
+        )
+
+
+class DependencyTree:
+
+    """The parse trees of a list of spaCy Docs as flat token arrays.
+
+    Tokens are numbered across the documents. heads[t] is the token t
+    attaches to (roots head themselves), deps[t] its dependency label id,
+    depth[t] its distance from the root and left_edges[t]:right_edges[t]
+    + 1 the span of its subtree. Built from Doc.to_array, so constituents
+    are found for a whole catalog with array operations rather than by
+    walking token.subtree.
+
+    Sentences are numbered like SentenceTable rows: the tokens of row r are
+    sent_starts[r]:sent_starts[r + 1], and roots[r] is its root token.
+    """
+
+    def __init__(self, documents, doc_ids=None):
+
+        """Read each Doc's HEAD, DEP, IDX and SENT_START arrays
+
+        ARGS: documents, Docs; doc_ids (optional) their ids, DEFAULT: 0, 1, ..
+        """
+
+        heads, deps, char_starts, char_ends, flags, texts = [], [], [], [], [], []
+        sent_ids, ids, doc_tokens = [], [], [0]
+        chars, strings = 0, {}
+        for n, doc in enumerate(documents):
+            ids.append(n if doc_ids is None else doc_ids[n])
+            doc_tokens.append(doc_tokens[-1] + len(doc))
+            if not len(doc):
+                continue
+            array = doc.to_array(["HEAD", "DEP", "IDX", "SENT_START"])
+            deps.append(array[:, 1])
+            # HEAD offsets and SENT_START flags are signed
+            array = array.astype(np.int64)
+            heads.append(array[:, 0] + np.arange(len(doc)) + doc_tokens[-2])
+            starts = array[:, 2] + chars
+            char_starts.append(starts)
+            char_ends.append(np.append(starts[1:], chars + len(doc.text)))
+            is_start = array[:, 3] == 1
+            is_start[0] = True
+            flags.append(is_start)
+            sent_ids.append(np.arange(is_start.sum()))
+            texts.append(doc.text)
+            chars += len(doc.text)
+            strings = doc.vocab.strings
+
+        def stack(parts, dtype):
+            return np.concatenate([np.zeros(0, dtype)] + parts).astype(dtype)
+
+        self.heads = stack(heads, np.int32)
+        self.deps = stack(deps, np.uint64)
+        self.char_starts = stack(char_starts, np.int64)
+        self.char_ends = stack(char_ends, np.int64)
+        self.sent_starts = np.append(
+            np.flatnonzero(stack(flags, bool)), len(self.heads)
+        )
+        self.sent_ids = stack(sent_ids, np.int32)
+        self.doc_ids = np.array(ids, dtype=np.int32)
+        self.doc_tokens = np.array(doc_tokens, dtype=np.int64)
+        self.text = "".join(texts)
+        self.labels = {int(d): strings[int(d)] for d in np.unique(self.deps)}
+        self._index()
+
+    @classmethod
+    def merge(cls, trees):
+
+        """Concatenate trees, renumbering tokens, characters and documents """
+
+        tree = cls.__new__(cls)
+        token_base = np.cumsum([0] + [len(t) for t in trees])
+        char_base = np.cumsum([0] + [len(t.text) for t in trees])
+        doc_base = np.cumsum([0] + [len(t.doc_ids) for t in trees])
+
+        def join(parts, dtype):
+            return np.concatenate([np.zeros(0, dtype)] + parts).astype(dtype)
+
+        tree.heads = join([t.heads + b for t, b in zip(trees, token_base)], np.int32)
+        tree.deps = join([t.deps for t in trees], np.uint64)
+        tree.char_starts = join(
+            [t.char_starts + b for t, b in zip(trees, char_base)], np.int64
+        )
+        tree.char_ends = join(
+            [t.char_ends + b for t, b in zip(trees, char_base)], np.int64
+        )
+        tree.sent_starts = join(
+            [t.sent_starts[:-1] + b for t, b in zip(trees, token_base)]
+            + [token_base[-1:]],
+            np.int64,
+        )
+        tree.sent_ids = join([t.sent_ids for t in trees], np.int32)
+        tree.doc_ids = np.arange(doc_base[-1], dtype=np.int32)
+        tree.doc_tokens = join(
+            [t.doc_tokens[:-1] + b for t, b in zip(trees, token_base)]
+            + [token_base[-1:]],
+            np.int64,
+        )
+        tree.text = "".join(t.text for t in trees)
+        tree.labels = {k: v for t in trees for k, v in t.labels.items()}
+        tree._index()
+
+        return tree
+
+    def _index(self):
+
+        """Derive sentence rows and roots, depths and subtree edges """
+
+        tokens = np.arange(len(self.heads), dtype=np.int32)
+        lengths = np.diff(self.sent_starts)
+        self.sents = np.repeat(np.arange(len(lengths), dtype=np.int32), lengths)
+        sent_docs = np.searchsorted(self.doc_tokens, self.sent_starts[:-1], "right") - 1
+        self._rows = {
+            (int(self.doc_ids[d]), int(j)): r
+            for r, (d, j) in enumerate(zip(sent_docs, self.sent_ids))
+        }
+        self.roots = np.full(len(lengths), -1, dtype=np.int32)
+        own = np.flatnonzero(self.heads == tokens)
+        rows, first = np.unique(self.sents[own], return_index=True)
+        self.roots[rows] = own[first]
+
+        # Pointer doubling: distance to ancestor[t], until that is a root
+        self.depth = (self.heads != tokens).astype(np.int32)
+        ancestor = self.heads.copy()
+        while len(ancestor) and np.any(self.heads[ancestor] != ancestor):
+            self.depth += self.depth[ancestor]
+            ancestor = ancestor[ancestor]
+
+        # Each level, deepest first, passes its edges up to its heads
+        self.left_edges = tokens.copy()
+        self.right_edges = tokens.copy()
+        by_depth = np.argsort(self.depth, kind="stable")
+        bounds = np.searchsorted(
+            self.depth[by_depth], np.arange(self.depth.max(initial=0) + 2)
+        )
+        for level in range(len(bounds) - 2, 0, -1):
+            nodes = by_depth[bounds[level] : bounds[level + 1]]
+            np.minimum.at(self.left_edges, self.heads[nodes], self.left_edges[nodes])
+            np.maximum.at(self.right_edges, self.heads[nodes], self.right_edges[nodes])
+
+    def row(self, doc, sent):
+
+        """Row number of sentence sent in document doc """
+
+        return self._rows[(doc, sent)]
+
+    def label(self, dep):
+
+        """Dependency label of a dep id """
+
+        return self.labels.get(int(dep), "")
+
+    def label_ids(self, labels):
+
+        """Dep ids of the labels that occur in the tree """
+
+        wanted = set(labels)
+
+        return np.array(
+            [k for k, v in self.labels.items() if v in wanted], dtype=np.uint64
+        )
+
+    def children(self, tokens, labels=None, exclude=()):
+
+        """Sorted children of tokens, optionally only those with the given
+        dependency labels, and never those with excluded labels
+        """
+
+        parents = np.zeros(len(self.heads), dtype=bool)
+        parents[tokens] = True
+        found = parents[self.heads] & (self.heads != np.arange(len(self.heads)))
+        if labels is not None:
+            found &= np.isin(self.deps, self.label_ids(labels))
+        if exclude:
+            found &= ~np.isin(self.deps, self.label_ids(exclude))
+
+        return np.flatnonzero(found)
+
+    def spans(self, tokens):
+
+        """(starts, ends) token spans of the subtrees of tokens """
+
+        return self.left_edges[tokens], self.right_edges[tokens] + 1
+
+    def texts(self, tokens):
+
+        """Subtree text of each token, with trailing whitespace """
+
+        starts = self.char_starts[self.left_edges[tokens]]
+        ends = self.char_ends[self.right_edges[tokens]]
+
+        return [self.text[a:b] for a, b in zip(starts, ends)]
+
+    def export(self, doc):
+
+        """Arrays of one document's tree, with token numbers within it """
+
+        part = int(np.flatnonzero(self.doc_ids == doc)[0])
+        start, end = self.doc_tokens[part], self.doc_tokens[part + 1]
+
+        return {
+            "heads": self.heads[start:end] - start,
+            "deps": [self.label(d) for d in self.deps[start:end]],
+            "left_edges": self.left_edges[start:end] - start,
+            "right_edges": self.right_edges[start:end] - start,
+            "depth": self.depth[start:end],
+        }
+
+    def __len__(self):
+        return len(self.heads)
+
+    def __repr__(self):
+        return "<DependencyTree: {} tokens, {} sentences>".format(
+            len(self), len(self.roots)
+        )
@@ -1,6 +1,25 @@
 import unittest
+import unittest.mock
+import gzip
+import subprocess
+import tempfile
+import threading
+import types
+import urllib.error
+import urllib.request
+import numpy as np
+from spacy.tokens import Span
 from munger import *
 from scrapers import *
+from wikidump import build_index, read_abstracts, read_redirects
+from newsbreak import CorpseWriter, ExquisiteCorpse, NewsbreakServer
+from sentences import SentenceTable, SentenceVectors, DependencyTree, quote_spans, requote
+from gtts import batch_synthesize, long_text_to_mp3, split_text
+from helpers import process_group
+import httpclient
+import metrics
+from replay import Archive, ReplayServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 
 class TestSeleniumScrapers(unittest.TestCase):
@@ -65,6 +84,35 @@ class TestSeleniumScrapers(unittest.TestCase):
         self.assertTrue(len(self.o.headlines) > 0, "no data was fetched")
 
 
+class TestBrowserSupervisor(unittest.TestCase):
+    def supervise(self, command):
+        supervisor = BrowserSupervisor(poll=1)
+        supervisor.driver = types.SimpleNamespace(quit=lambda: None)
+        supervisor._process = subprocess.Popen(command, start_new_session=True)
+        supervisor.pid = supervisor._process.pid
+        return supervisor
+
+    def test_kill_reaches_reparented_children(self):
+        supervisor = self.supervise(["sh", "-c", "(sleep 60 &); exec sleep 60"])
+        pgid = supervisor.pid
+        for _ in range(50):
+            if len(process_group(pgid)) == 2:
+                break
+            time.sleep(0.1)
+        self.assertEqual(len(process_group(pgid)), 2)
+        supervisor.kill("test")
+        self.assertEqual(process_group(pgid), {})
+        self.assertEqual(supervisor.killed, "test")
+        self.assertIsNone(supervisor.pid)
+
+    def test_clean_quit_signals_nothing_else(self):
+        supervisor = self.supervise(["sleep", "60"])
+        with unittest.mock.patch("os.killpg") as killpg:
+            supervisor.quit()
+        killpg.assert_not_called()
+        self.assertIsNotNone(supervisor._process.returncode)
+
+
 class TestAggregator(unittest.TestCase):
     """   """
 
@@ -253,3 +301,830 @@ class TestPersonScanner(unittest.TestCase):
             ["Joe", "Biden", "Joe Biden", "Mr. Biden", "Mr. Joe Biden"],
             "Expected 5 elements",
         )
+
+
+class TestPersonInfo(unittest.TestCase):
+    def test_gazetteer_classifies_first_names(self):
+        gazetteer = load_gazetteer()
+        self.assertEqual(gazetteer["names"]["Amy"], "Female")
+        self.assertEqual(gazetteer["names"]["Joe"], "Male")
+        self.assertIn("Sen.", gazetteer["generic"])
+
+    def test_get_person_info_uses_titles(self):
+        pinfo = get_person_info("Sen. Amy Klobuchar")
+        self.assertEqual(pinfo["role"], "Sen.", "expected role Sen.")
+        self.assertEqual(pinfo["first"], "Amy", "expected first name Amy")
+        self.assertEqual(pinfo["gender"], "Female", "expected gender Female")
+
+    def test_get_people_info_dedupes_batch(self):
+        info = get_people_info(["Mr. Biden", "Mr. Biden", "Amy Klobuchar"])
+        self.assertEqual(len(info), 2, "expected one entry per unique name")
+        self.assertEqual(info["Mr. Biden"]["last"], "Biden")
+
+
+class TestNormalizeText(unittest.TestCase):
+    def test_normalize_text_balances_strips_and_truncates(self):
+        text, dateline = normalize_text(
+            'WASHINGTON (AP) — He said "no  comment".\n\n'
+            "  Then ''he left.\n___\nAssociated Press writer contributed."
+        )
+        self.assertEqual(dateline, "WASHINGTON (AP) — ")
+        self.assertEqual(text, "He said “no comment”.\nThen “he left.”")
+
+
+class TestAPArticleExtraction(unittest.TestCase):
+    def setUp(self):
+        with open("fixtures/ap_article.html") as infile:
+            self.html = infile.read()
+
+    def test_json_and_soup_paths_agree(self):
+        fast = APArticle("https://apnews.com/abc123", html=self.html)
+        slow = APArticle("https://apnews.com/abc123", html=self.html, fast=False)
+        self.assertEqual(fast.title, slow.title)
+        self.assertEqual(fast.byline, slow.byline)
+        self.assertEqual(fast.timestamp, slow.timestamp)
+        self.assertEqual(fast.content["text"], slow.content["text"])
+
+    def test_page_without_a_story(self):
+        with open("fixtures/ap_hub.html") as infile:
+            html = infile.read()
+        for fast in (True, False):
+            article = APArticle("https://apnews.com/hub", html=html, fast=fast)
+            self.assertIsNone(article.content)
+
+
+class TestWikiIndex(unittest.TestCase):
+    def setUp(self):
+        self.prefix = os.path.join(tempfile.mkdtemp(), "wiki")
+        build_index(
+            read_abstracts("fixtures/wiki_abstracts.xml"),
+            self.prefix,
+            read_redirects("fixtures/wiki_redirects.tsv"),
+        )
+        WikiLead.use_index(self.prefix, offline=True)
+
+    def tearDown(self):
+        WikiLead.index.close()
+        WikiLead.index = None
+        WikiLead.offline = False
+
+    def test_index_resolves_titles_and_redirects(self):
+        self.assertEqual(WikiLead.index.get("Amy_Klobuchar")["title"], "Amy Klobuchar")
+        self.assertEqual(WikiLead.index.get("Joseph Biden")["title"], "Joe Biden")
+        self.assertIsNone(WikiLead.index.get("Nobody In Particular"))
+
+    def test_wiki_scrapers_run_offline(self):
+        person = WikiPerson("Amy Klobuchar")
+        self.assertTrue(person.found, "expected Amy Klobuchar in the index")
+        self.assertEqual(person.gender, "Female")
+        org = WikiOrg("the UN")
+        self.assertEqual(org.canonical_name, "United Nations")
+        self.assertEqual(org.abbr, "UN")
+        self.assertFalse(WikiPerson("Nobody In Particular").found)
+
+    def test_leads_without_bold_fall_back_to_the_network(self):
+        WikiLead.index.close()
+        build_index(
+            [("John F. Kennedy", "John Fitzgerald Kennedy was the 35th president.")],
+            self.prefix + "_jfk",
+        )
+        WikiLead.use_index(self.prefix + "_jfk", offline=True)
+        self.assertFalse(WikiPerson("John F. Kennedy").found)
+        WikiLead.offline = False
+        page = (
+            b"<html><h1>John F. Kennedy</h1>"
+            b"<p><b>John Fitzgerald Kennedy</b> was the 35th president.</p></html>"
+        )
+        handler = type(
+            "PageHandler", (KeepAliveHandler,), {"page": page, "long_page": page}
+        )
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        httpclient.route("http://127.0.0.1:{}".format(server.server_port))
+        try:
+            self.assertTrue(WikiPerson("John F. Kennedy").found)
+        finally:
+            httpclient.route(None)
+            server.shutdown()
+            server.server_close()
+
+
+class TestAPHub(unittest.TestCase):
+    def setUp(self):
+        with open("fixtures/ap_hub.html") as infile:
+            self.html = infile.read()
+
+    def test_parse_topics(self):
+        topics = APHub.parse_topics(self.html)
+        self.assertEqual(topics[1], (2, "Entertainment", "/hub/entertainment"))
+
+    def test_parse_headlines_from_embedded_state(self):
+        headlines = APHub.parse_headlines(self.html, "Politics")
+        self.assertEqual(len(headlines), 3, "expected three headlines")
+        self.assertEqual(
+            headlines[0],
+            ("Politics", "https://apnews.com/article/abc123", "Senate passes the measure"),
+        )
+
+    def test_parse_headlines_from_feed_cards(self):
+        html = self.html.replace("titanium-state", "no-state")
+        headlines = APHub.parse_headlines(html, "Politics")
+        self.assertEqual([h[1] for h in headlines][-1], "https://apnews.com/article/ghi789")
+
+
+class TestAggregatorTopics(unittest.TestCase):
+    def setUp(self):
+        with open("fixtures/ap_hub.html") as infile:
+            self.html = infile.read()
+        self.cwd = os.getcwd()
+        os.chdir(tempfile.mkdtemp())
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+
+    def test_homepage_is_fetched_once(self):
+        fetched = []
+
+        def get(url):
+            fetched.append(url)
+            return self.html
+
+        with unittest.mock.patch.object(APHub, "_get", side_effect=get):
+            aggregator = Aggregator()
+            headlines = aggregator.collect_ap_headlines()
+        self.assertEqual(fetched.count(APHub.url), 1)
+        self.assertEqual(len(fetched), 1 + len(aggregator.topics))
+        self.assertEqual(len(headlines), 3 * len(aggregator.topics))
+
+
+class TestTrendsFeed(unittest.TestCase):
+    def setUp(self):
+        with open("fixtures/trends_rss.xml", "rb") as infile:
+            self.feed = TrendsFeed(xml=infile.read())
+
+    def test_feed_items_become_trend_tuples(self):
+        self.assertEqual(
+            self.feed.trends[0],
+            (
+                "Hurricane Laura",
+                "2,000,000+",
+                "Hurricane Laura strengthens to Category 4 storm",
+            ),
+        )
+        self.assertEqual(self.feed.trends[2], ("Chadwick Boseman", "5,000,000+", None))
+
+    def test_ngrams(self):
+        self.assertEqual(
+            self.feed.ngrams, ["Hurricane Laura", "Kyle Rittenhouse", "Chadwick Boseman"]
+        )
+
+
+class FakeTTSClient:
+    """Local stand-in for google.cloud.texttospeech.TextToSpeechClient """
+
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def synthesize_speech(self, input, voice, audio_config):
+        with self.lock:
+            self.calls += 1
+        return types.SimpleNamespace(audio_content=input.text.encode("utf-8"))
+
+
+class TestBatchSynthesis(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.client = FakeTTSClient()
+
+    def synthesize(self, texts):
+        return batch_synthesize(
+            "en-US-Wavenet-D", texts, client=self.client, cache_dir=self.cache_dir
+        )
+
+    def test_batch_keeps_order_and_caches(self):
+        texts = ["First sentence.", "Second sentence.", "Third sentence."]
+        paths = self.synthesize(texts)
+        for path, text in zip(paths, texts):
+            with open(path, "rb") as infile:
+                self.assertEqual(infile.read().decode("utf-8"), text)
+        self.assertEqual(self.client.calls, 3)
+        self.assertEqual(self.synthesize(texts), paths)
+        self.assertEqual(self.client.calls, 3, "cached texts were re-synthesized")
+
+    def test_identical_texts_are_synthesized_once(self):
+        texts = ["The same corpse."] * 8
+        paths = batch_synthesize(
+            "en-US-Wavenet-D",
+            texts,
+            client=self.client,
+            max_workers=8,
+            cache_dir=self.cache_dir,
+        )
+        self.assertEqual(self.client.calls, 1)
+        self.assertEqual(len(set(paths)), 1)
+        self.assertEqual(os.listdir(os.path.dirname(paths[0])), [os.path.basename(paths[0])])
+
+    def test_cached_texts_need_no_client(self):
+        texts = ["First sentence.", "Second sentence."]
+        paths = self.synthesize(texts)
+        with unittest.mock.patch("gtts.texttospeech", side_effect=ImportError):
+            self.assertEqual(
+                batch_synthesize("en-US-Wavenet-D", texts, cache_dir=self.cache_dir),
+                paths,
+            )
+
+    def test_voice_is_part_of_the_cache_key(self):
+        self.synthesize(["Hello."])
+        batch_synthesize(
+            "en-GB-Wavenet-A", ["Hello."], client=self.client, cache_dir=self.cache_dir
+        )
+        self.assertEqual(self.client.calls, 2)
+
+    def test_split_text_keeps_sentences_under_the_limit(self):
+        text = "One sentence here. Another “quoted” one! " * 20
+        chunks = split_text(text, limit=100)
+        self.assertTrue(all(len(c.encode("utf-8")) <= 100 for c in chunks))
+        self.assertTrue(all(c.endswith(("here.", "one!")) for c in chunks))
+        self.assertEqual(" ".join(chunks), text.strip())
+
+    def test_split_text_never_sends_empty_or_oversized_chunks(self):
+        self.assertEqual(
+            split_text("A" * 30 + ". Short.", limit=10),
+            ["A" * 10, "A" * 10, "A" * 10, ". Short."],
+        )
+        chunks = split_text("Ünïcödé" * 5 + ".", limit=7)
+        self.assertTrue(all(0 < len(c.encode("utf-8")) <= 7 for c in chunks))
+        self.assertEqual("".join(chunks), "Ünïcödé" * 5 + ".")
+
+    def test_long_text_is_assembled_in_order(self):
+        text = " ".join("Sentence number {}.".format(n) for n in range(50))
+        filename = os.path.join(self.cache_dir, "corpse.mp3")
+        long_text_to_mp3(
+            "en-US-Wavenet-D",
+            text,
+            filename,
+            client=self.client,
+            limit=60,
+            cache_dir=self.cache_dir,
+        )
+        with open(filename, "rb") as infile:
+            audio = infile.read().decode("utf-8")
+        self.assertEqual(audio, "".join(split_text(text, limit=60)))
+        self.assertTrue(self.client.calls > 1, "expected several requests")
+
+
+class TestCorpseWriter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def test_records_rotate_by_size(self):
+        record = {"title": "Corpse", "seed": 1, "sentences": [{"text": "x" * 50}]}
+        with CorpseWriter(self.directory, max_bytes=200) as writer:
+            for _ in range(10):
+                writer.write(record)
+        files = sorted(os.listdir(self.directory))
+        self.assertTrue(len(files) > 1, "expected the output to rotate")
+        lines = []
+        for name in files:
+            with open(os.path.join(self.directory, name)) as infile:
+                lines.extend(infile.read().splitlines())
+        self.assertEqual([json.loads(line) for line in lines], [record] * 10)
+
+    def test_compressed_output(self):
+        with CorpseWriter(self.directory, compress=True) as writer:
+            writer.write({"title": "Corpse"})
+            path = writer.path
+        with gzip.open(path, "rt") as infile:
+            self.assertEqual(json.loads(infile.readline()), {"title": "Corpse"})
+
+
+class TestProvenance(unittest.TestCase):
+    def test_root_munges_name_both_sentences(self):
+        munger = Munger([nlp("The dog ran home."), nlp("The cat ran away.")])
+        munged = munger.munge_on_roots(munger.sentence_at(0))
+        self.assertEqual(sentence_sources(munged), [(0, 0), (1, 0)])
+
+    def test_records_list_each_sentences_sources(self):
+        register_doc_extensions()
+        base = list(nlp("A dog ran. A cat sat.").sents)
+        munged = nlp("A dog sat.")
+        # as read back from the MungeCache disk tier
+        munged._.sources = [[0, 1], [3, 0]]
+        corpse = {
+            "title": "Corpse",
+            "seed": 1,
+            "source": 0,
+            "sentences": [(0, 0, "run", base[0]), (None, None, "sit", munged[:])],
+        }
+        record = ExquisiteCorpse.record(corpse)
+        self.assertEqual(
+            [sent["sources"] for sent in record["sentences"]],
+            [[[0, 0]], [[0, 1], [3, 0]]],
+        )
+        json.dumps(record)
+
+
+class StubCatalog:
+    """A DocumentCatalog stand-in over a few parsed texts """
+
+    def __init__(self, texts):
+        self.documents = [nlp(text) for text in texts]
+
+    def __repr__(self):
+        return "<StubCatalog: {} documents>".format(len(self.documents))
+
+
+class TestNewsbreakServer(unittest.TestCase):
+    def setUp(self):
+        texts = ["The dog ran home. The cat ran away.", "The bird ran off."]
+        self.catalogs = [StubCatalog(texts), StubCatalog(texts[:1])]
+        loads = iter(self.catalogs)
+        self.server = NewsbreakServer(("127.0.0.1", 0), catalog=lambda: next(loads))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:{}".format(self.server.server_port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def request(self, path, method="GET"):
+        request = urllib.request.Request(self.url + path, method=method)
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as err:
+            return err.code, json.loads(err.read())
+
+    def test_corpses(self):
+        with unittest.mock.patch("newsbreak.print", create=True) as echo:
+            status, corpses = self.request("/corpses?n=2")
+        self.assertEqual(status, 200)
+        self.assertEqual(len(corpses), 2)
+        self.assertTrue(all(corpse["text"] for corpse in corpses))
+        echo.assert_not_called()
+        for query in ["n=0", "n=101", "n=two"]:
+            status, reply = self.request("/corpses?" + query)
+            self.assertEqual(status, 400, query)
+            self.assertIn("error", reply)
+
+    def test_stats(self):
+        self.request("/corpses?n=1")
+        status, stats = self.request("/stats")
+        self.assertEqual(status, 200)
+        self.assertEqual(stats["documents"], 2)
+        self.assertEqual(stats["corpses_built"], 1)
+        self.assertEqual(stats["catalog"], "<StubCatalog: 2 documents>")
+
+    def test_refresh_swaps_the_catalog(self):
+        status, reply = self.request("/refresh", method="POST")
+        self.assertEqual((status, reply), (202, {"refreshing": True}))
+        for _ in range(100):
+            if self.server.refreshed_at:
+                break
+            time.sleep(0.05)
+        self.assertIs(self.server.catalog, self.catalogs[1])
+        self.assertEqual(self.request("/stats")[1]["documents"], 1)
+
+
+class TestMungeCache(unittest.TestCase):
+    def test_lru_eviction_and_stats(self):
+        cache = MungeCache(maxsize=2)
+        sents = [(None, None, "be", s) for s in nlp("One. Two. Three.").sents]
+        for i, sent in enumerate(sents):
+            cache.put(("fp", "roots", i), sent)
+        self.assertIsNone(cache.get(("fp", "roots", 0)), "oldest entry kept")
+        self.assertEqual(cache.get(("fp", "roots", 2))[-1].text, "Three.")
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_unidentified_sentences_are_not_keyed(self):
+        with self.assertRaises(ValueError):
+            munge_key_part((None, None, "be", None))
+        self.assertEqual(munge_key_part((3, 4, "be", None)), (3, 4))
+
+
+class TestSentenceVectors(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.vectors = rng.standard_normal((400, 32))
+        lemmas = ["say", "go"] * 200
+        self.index = SentenceVectors(
+            self.vectors, [n // 10 for n in range(400)], [n % 10 for n in range(400)], lemmas
+        )
+
+    def test_nearest_sentence_sharing_root(self):
+        query = self.vectors[42] + 0.01
+        self.assertEqual(self.index.similar(query, k=3, lemma="say")[0], (4, 2))
+        found = self.index.similar(query, k=3, lemma="go")
+        self.assertEqual(len(found), 3)
+        self.assertTrue(all(s % 2 == 1 for _, s in found), "wrong root returned")
+
+    def test_exclude_and_unknown_lemma(self):
+        query = self.vectors[42]
+        self.assertNotIn((4, 2), self.index.similar(query, k=3, exclude=[(4, 2)]))
+        self.assertEqual(self.index.similar(query, lemma="fly"), [])
+
+
+class TestSentenceTable(unittest.TestCase):
+    def setUp(self):
+        self.docs = [
+            nlp("The dog ran home. The cat said, “I am hungry.” The cat ran away."),
+            nlp("A bird ran off. She wrote “Go” and “Stop."),
+        ]
+        self.table = SentenceTable(self.docs)
+
+    def test_flags(self):
+        table = self.table
+        self.assertEqual(len(table), len(list(self.docs[0].sents)) + 2)
+        self.assertTrue(table.is_saying[table.row(0, 1)])
+        self.assertTrue(table.has_quotes[table.row(0, 1)])
+        self.assertFalse(table.quote_parity[table.row(0, 1)])
+        self.assertTrue(table.quote_parity[table.row(1, 1)])
+        self.assertTrue(table.eligible[table.row(0, 0)])
+
+    def test_pick_draws_only_eligible_rows(self):
+        table = self.table
+        rows = table.eligible_rows("run")
+        self.assertEqual(len(rows), 3)
+        for _ in range(20):
+            self.assertNotEqual(table.pick(rows, [(0, 0)]), table.row(0, 0))
+            self.assertIn(table.pick(table.pairable), rows)
+        self.assertIsNone(table.pick(rows[:1], [table.ids(rows[0])]))
+
+
+class TestQuoteSpans(unittest.TestCase):
+    def test_matched_quote_and_speaker(self):
+        sent = nlp("“I am hungry,” the cat said.")[:]
+        spans = quote_spans(sent)
+        self.assertEqual([span[:2] + span[4:] for span in spans], [(0, 5, True)])
+        self.assertEqual(sent[spans[0][2]].text, "said")
+        self.assertEqual(sent[spans[0][3]].text, "cat")
+        self.assertEqual(requote(sent, spans, ["Meow,"]), "“Meow,” the cat said.")
+
+    def test_unmatched_quotes_are_closed(self):
+        sent = nlp("He said hi” and then “bye.")[:]
+        spans = quote_spans(sent)
+        self.assertEqual([(span[0], span[4]) for span in spans], [(-1, False), (6, False)])
+        self.assertEqual(spans[1][1], len(sent))
+        self.assertEqual(requote(sent, spans).count("“"), requote(sent, spans).count("”"))
+
+
+class TestInflection(unittest.TestCase):
+    def test_cached_inflection(self):
+        from helpers import inflect, inflect_token
+
+        self.assertEqual(inflect("run", "VBD"), "ran")
+        self.assertEqual(inflect("run", "VB"), "run")
+        self.assertIsNone(inflect("run", ""))
+        hits = inflect.cache_info().hits
+        inflect("run", "VBD")
+        self.assertEqual(inflect.cache_info().hits, hits + 1)
+        token = nlp("Dogs bark.")[1]
+        self.assertEqual(inflect_token(token, "VBD"), "barked")
+
+    def test_irregular_table(self):
+        self.assertEqual(irreg_inflect("be", (1, 1, 2)), "were")
+        self.assertEqual(irreg_inflect("have", (0, 0, 2)), "has")
+
+
+def make_stories(texts, byline=None, day=None):
+    """Stand-ins for scraped stories, one per text """
+    return [
+        types.SimpleNamespace(
+            title="Story {}".format(i),
+            byline=byline,
+            timestamp=day and day.isoformat(),
+            content={"text": text},
+        )
+        for i, text in enumerate(texts)
+    ]
+
+
+def pickle_stories(path, stories):
+    """Write stories where load_or_refresh_ag would have pickled them """
+    with open(path, "wb") as pkl:
+        pickle.dump(types.SimpleNamespace(stories=stories), pkl)
+
+
+class TestRollingCatalog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.today = datetime.date(2020, 8, 10)
+        self.earlier = self.today - datetime.timedelta(days=2)
+        pickle_stories(
+            os.path.join(self.directory, "ag_20200808.pkl"),
+            make_stories(["The cat sat down. The dog sat up."], "By AP", self.earlier),
+        )
+
+    def crawl(self, cached):
+        pickle_stories(
+            cached,
+            make_stories(
+                ["The dog ran home. The cat ran away.", "Birds sing."],
+                "By AP",
+                self.today,
+            ),
+        )
+
+    def test_segments_merge_and_evict(self):
+        self.crawl(os.path.join(self.directory, "ag_20200810.pkl"))
+        catalog = RollingCatalog(
+            days=5, max_bytes=1, directory=self.directory, today=self.today
+        )
+        self.assertEqual([s.stamp for s in catalog.segments], ["20200808", "20200810"])
+        documents = catalog.documents
+        self.assertEqual(len(documents), 3)
+        self.assertEqual(len(documents.sentence_table), 5)
+        self.assertEqual(documents[0].text, "The cat sat down. The dog sat up.")
+        self.assertEqual(documents[-1]._.title, "Story 1")
+        self.assertEqual(len(catalog._resident), 1)
+        resident = [s for s in catalog.segments if s.stamp in catalog._resident]
+        self.assertEqual(catalog.resident_bytes, resident[0].doc_bytes)
+        self.assertGreater(resident[0].doc_bytes, 0)
+        munger = Munger(documents)
+        self.assertEqual(munger.fingerprint, documents.fingerprint)
+        self.assertIn("sit", munger._sentences)
+
+    def test_missing_today_is_crawled_into_the_directory(self):
+        crawled = []
+
+        def crawl(cached):
+            crawled.append(cached)
+            self.crawl(cached)
+
+        catalog = RollingCatalog(
+            days=5, directory=self.directory, today=self.today, crawl=crawl
+        )
+        self.assertEqual(crawled, [os.path.join(self.directory, "ag_20200810.pkl")])
+        self.assertEqual([s.stamp for s in catalog.segments], ["20200808", "20200810"])
+        self.assertEqual(len(catalog.documents), 3)
+
+    def test_failed_crawl_leaves_today_out(self):
+        catalog = RollingCatalog(
+            days=5,
+            directory=self.directory,
+            today=self.today,
+            crawl=lambda cached: None,
+        )
+        self.assertEqual([s.stamp for s in catalog.segments], ["20200808"])
+
+
+class TestShardedCatalog(unittest.TestCase):
+    def test_shards_answer_like_one_catalog(self):
+        texts = [
+            "The dog ran home. The cat ran away.",
+            "Birds sing.",
+            "The cat sat down. The dog sat up.",
+        ]
+        stories = make_stories(texts)
+        pairs = [(0, 0), (2, 0), (2, 1)]
+        with ShardedCatalog(workers=2, stories=stories) as catalog:
+            local = parse_stories(stories)
+            documents = catalog.documents
+            self.assertEqual([doc.text for doc in documents], texts)
+            self.assertEqual(documents[2]._.title, "Story 2")
+            self.assertEqual(len(documents.sentence_table), 5)
+            self.assertEqual(documents.subtrees(pairs), collect_subtrees(local, pairs))
+
+
+class TestLazyDocuments(unittest.TestCase):
+    def test_materialize_on_access(self):
+        texts = ["The dog ran home. The cat ran away.", "Birds sing.", "The cat sat."]
+        documents = LazyDocuments((nlp(text) for text in texts), cached_docs=2)
+        self.assertEqual(len(documents), 3)
+        self.assertEqual(len(documents._docs), 0, "nothing should be live yet")
+        self.assertEqual([doc.text for doc in documents], texts)
+        self.assertEqual(len(documents._docs), 2)
+        self.assertIs(documents[2], documents[-1])
+        self.assertEqual(len(documents.sentence_table), 4)
+        self.assertEqual(documents[0][1].dep_, nlp(texts[0])[1].dep_)
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    page = b"<html><h1>Lead</h1>" + b"<p><b>Lead</b> paragraph.</p>" * 200 + b"</html>"
+
+    long_page = page + b"<p>" + b"x" * (256 << 10) + b"</p>"
+
+    def do_GET(self):
+        if self.path.endswith("/Long"):
+            body = self.long_page
+            self.send_response(200)
+        else:
+            body = gzip.compress(self.page)
+            self.send_response(200)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        getattr(self.server, "peers", set()).add(self.client_address)
+        try:
+            self.wfile.write(body)
+        except ConnectionError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHTTPClient(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        self.server.peers = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:{}/".format(self.server.server_port)
+        self.host = "http://127.0.0.1:{}".format(self.server.server_port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        def fetch():
+            for _ in range(10):
+                self.assertEqual(httpclient.get(self.url).content, KeepAliveHandler.page)
+
+        threads = [threading.Thread(target=fetch) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = httpclient.stats()[self.host]
+        self.assertEqual(stats["requests"], 20)
+        self.assertLessEqual(stats["connections"], 2)
+
+    def test_streamed_lead_returns_its_connection(self):
+        for _ in range(3):
+            lead = WikiLead(self.url + "wiki/Lead", chunk_size=256)
+            self.assertEqual(lead.heading, "Lead")
+            next(lead.paragraphs())
+            lead.close()
+        self.assertEqual(httpclient.stats()[self.host]["connections"], 1)
+
+    def test_long_remainders_are_not_drained(self):
+        for _ in range(2):
+            lead = WikiLead(self.url + "wiki/Long", chunk_size=256)
+            next(lead.paragraphs())
+            lead.close()
+            self.assertLess(lead.bytes_read, 64 << 10)
+        self.assertEqual(len(self.server.peers), 2, "expected a new connection")
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.origin = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        threading.Thread(target=self.origin.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:{}/wiki/Lead".format(self.origin.server_port)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.origin.shutdown()
+        self.origin.server_close()
+
+    def record(self):
+        archive = Archive(self.directory)
+        httpclient.record(archive)
+        try:
+            WikiLead(self.url).close()
+        finally:
+            httpclient.record(None)
+        return archive
+
+    def test_recorded_responses_are_replayed(self):
+        self.assertEqual(len(self.record()), 1)
+        self.origin.shutdown()
+        with ReplayServer(self.directory, latency=0.01) as server:
+            lead = WikiLead(self.url)
+            self.assertEqual(lead.heading, "Lead")
+            self.assertEqual(next(lead.paragraphs()).b.text, "Lead")
+            self.assertEqual(httpclient.get(self.url + "/missing").status_code, 404)
+        self.assertEqual(server.stats(), {"requests": 2, "errors": 0, "misses": 1})
+
+    def test_unquoted_urls_are_replayed(self):
+        base = "http://127.0.0.1:{}/wiki/".format(self.origin.server_port)
+        urls = [base + "José_Martí", base + "New York City", base + "Zürich#History"]
+        archive = Archive(self.directory)
+        httpclient.record(archive)
+        try:
+            for url in urls:
+                WikiLead(url).close()
+        finally:
+            httpclient.record(None)
+        with ReplayServer(self.directory) as server:
+            for url in urls:
+                self.assertEqual(WikiLead(url).heading, "Lead")
+        self.assertEqual(server.stats()["misses"], 0)
+
+    def test_injected_errors(self):
+        self.record()
+        with ReplayServer(self.directory, error_rate=1.0, error_status=410) as server:
+            self.assertEqual(httpclient.get(self.url).status_code, 410)
+        self.assertEqual(server.errors, 1)
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.Registry()
+
+    def test_render_prometheus_text(self):
+        fetched = self.registry.register(
+            metrics.Counter("fetched_total", "Articles", ["topic"])
+        )
+        fetched.inc(topic="Sports")
+        fetched.inc(2, topic='Say "what"')
+        seconds = self.registry.register(
+            metrics.Histogram("load_seconds", "Loads", buckets=(0.1, 1))
+        )
+        for value in (0.05, 0.5, 5):
+            seconds.observe(value)
+        text = self.registry.render()
+        self.assertIn("# TYPE fetched_total counter\n", text)
+        self.assertIn('fetched_total{topic="Sports"} 1\n', text)
+        self.assertIn('fetched_total{topic="Say \\"what\\""} 2\n', text)
+        self.assertIn('load_seconds_bucket{le="1"} 2\n', text)
+        self.assertIn('load_seconds_bucket{le="+Inf"} 3\n', text)
+        self.assertIn("load_seconds_sum 5.55\n", text)
+        self.assertEqual(seconds.get(), (3, 5.55))
+
+    def test_labels_must_match(self):
+        fetched = metrics.Counter("fetched_total", "Articles", ["topic"])
+        with self.assertRaises(ValueError):
+            fetched.inc()
+        with self.assertRaises(ValueError):
+            fetched.inc(-1, topic="Sports")
+
+    def test_gauge_functions_are_read_on_export(self):
+        size = self.registry.register(metrics.Gauge("catalog_bytes", "Bytes"))
+        held = [b"x" * 10]
+        size.set_function(lambda: sum(len(b) for b in held))
+        held.append(b"y" * 5)
+        self.assertIn("catalog_bytes 15\n", self.registry.render())
+
+    def test_wiki_lookups_are_timed_by_source(self):
+        before = WIKI_LOOKUPS.get(source="offline")[0]
+        WikiLead.offline, WikiLead.index = True, None
+        try:
+            self.assertEqual(WikiLead("https://en.wikipedia.org/wiki/X").status_code, 404)
+        finally:
+            WikiLead.offline = False
+        self.assertEqual(WIKI_LOOKUPS.get(source="offline")[0], before + 1)
+
+    def test_scanners_count_their_entities(self):
+        doc = nlp.make_doc("Acme Corp hired Jane Doe in Ohio.")
+        doc.ents = [Span(doc, 0, 2, label="ORG"), Span(doc, 3, 5, label="PERSON")]
+        before = ENTITIES.get(label="ORG")
+        OrgScanner().scan(doc)
+        self.assertEqual(ENTITIES.get(label="ORG"), before + 1)
+        with self.assertRaises(TypeError):
+            OrgScanner().scan(42)
+
+    def test_served_and_dumped(self):
+        self.registry.register(metrics.Counter("runs_total", "Runs")).inc()
+        path = os.path.join(tempfile.mkdtemp(), "metrics.prom")
+        self.registry.dump(path)
+        with open(path) as infile:
+            self.assertIn("runs_total 1\n", infile.read())
+        server = metrics.serve(("127.0.0.1", 0))
+        try:
+            url = "http://127.0.0.1:{}/metrics".format(server.server_port)
+            self.assertIn("# TYPE ", httpclient.get(url).text)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestDependencyTree(unittest.TestCase):
+    def setUp(self):
+        words = ["The", "old", "man", "saw", "a", "dog", ".", "It", "ran", "home", "."]
+        heads = [2, 2, 3, 3, 5, 3, 3, 8, 8, 8, 8]
+        deps = ["det", "amod", "nsubj", "ROOT", "det", "dobj", "punct"]
+        deps += ["nsubj", "ROOT", "advmod", "punct"]
+        starts = [True] + [False] * 6 + [True, False, False, False]
+        self.docs = [
+            Doc(nlp.vocab, words=["Hi", "."], heads=[0, 0], deps=["ROOT", "punct"]),
+            Doc(nlp.vocab, words=words, heads=heads, deps=deps, sent_starts=starts),
+        ]
+        self.tree = DependencyTree(self.docs)
+
+    def test_arrays_match_the_parse(self):
+        for i, doc in enumerate(self.docs):
+            base = self.tree.doc_tokens[i]
+            for token in doc:
+                t = base + token.i
+                self.assertEqual(self.tree.heads[t] - base, token.head.i)
+                self.assertEqual(self.tree.left_edges[t] - base, token.left_edge.i)
+                self.assertEqual(self.tree.right_edges[t] - base, token.right_edge.i)
+                self.assertEqual(self.tree.depth[t], len(list(token.ancestors)))
+        self.assertEqual(list(self.tree.export(1)["depth"]), [2, 2, 1, 0, 2, 1, 1, 1, 0, 1, 1])
+        self.assertEqual(self.tree.roots[self.tree.row(1, 1)], 2 + 8)
+
+    def test_children_and_subtree_texts(self):
+        subjects = self.tree.children(self.tree.roots, labels=["nsubj"])
+        self.assertEqual(self.tree.texts(subjects), ["The old man ", "It "])
+        merged = DependencyTree.merge([DependencyTree(self.docs[:1]), DependencyTree(self.docs[1:])])
+        self.assertEqual(list(merged.children(merged.roots, exclude=["punct"])), [4, 7, 9, 11])
+
+    def test_collect_subtrees(self):
+        found = collect_subtrees(self.docs, [(1, 1), (1, 0)])
+        self.assertEqual(found["left"]["nsubj"], [(1, 1, "It "), (1, 0, "The old man ")])
+        self.assertEqual(found["right"], {"advmod": [(1, 1, "home ")], "dobj": [(1, 0, "a dog ")]})
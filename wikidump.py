@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Build and read a local index of Wikipedia lead paragraphs.
+
+The index is imported once from a Wikipedia abstracts (or lead-section)
+dump and an optional tab separated redirects file:
+
+    python wikidump.py enwiki-latest-abstract.xml.gz tmp/wiki redirects.tsv
+
+It is stored as two files: PREFIX.dat holds one JSON record per article,
+and PREFIX.idx holds sorted (title hash, record offset) pairs that are
+memory-mapped and binary searched, so lookups never load the whole index.
+"""
+
+import os
+import re
+import sys
+import gzip
+import html
+import json
+import mmap
+import struct
+import hashlib
+import xml.etree.ElementTree as ET
+
+KEY = struct.Struct("<QQ")
+
+
+def title_key(title):
+
+    """Stable 64 bit hash of a normalized article title """
+
+    norm = re.sub(r"[\s_]+", " ", title).strip().casefold()
+    digest = hashlib.blake2b(norm.encode("utf-8"), digest_size=8).digest()
+
+    return int.from_bytes(digest, "little")
+
+
+def open_dump(path, mode="rb"):
+
+    """Open a plain or gzipped dump file """
+
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def read_abstracts(path):
+
+    """Yield (title, abstract) pairs from a Wikipedia abstracts dump """
+
+    with open_dump(path) as infile:
+        for _, elem in ET.iterparse(infile, events=("end",)):
+            if elem.tag == "doc":
+                title = re.sub(r"^Wikipedia:\s*", "", elem.findtext("title") or "")
+                yield title, elem.findtext("abstract") or ""
+                elem.clear()
+
+
+def read_redirects(path):
+
+    """Yield (redirect, target) pairs from a tab separated file """
+
+    with open_dump(path, "rt") as infile:
+        for line in infile:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) == 2 and all(parts):
+                yield parts[0], parts[1]
+
+
+def lead_record(title, abstract, redirects=None):
+
+    """Build the stored record for an article's lead paragraph.
+
+    Lead-section dumps keep their <b> markup; plain abstracts get the
+    title emboldened where it opens the paragraph, as Wikipedia would.
+    Records left without bold text are passed over by scrapers.WikiLead,
+    which reads the live page instead.
+    """
+
+    if "<b>" in abstract:
+        lead = abstract
+    else:
+        lead = html.escape(abstract)
+        name = html.escape(title)
+        if lead.startswith(name):
+            lead = "<b>{}</b>{}".format(name, lead[len(name) :])
+    bold = [html.unescape(b) for b in re.findall(r"<b>(.*?)</b>", lead)]
+
+    return {
+        "title": title,
+        "html": "<p>{}</p>".format(lead),
+        "bold": bold,
+        "redirects": redirects or [],
+    }
+
+
+def build_index(abstracts, prefix, redirects=()):
+
+    """Write PREFIX.dat and PREFIX.idx from abstracts and redirects.
+
+    ARGS:
+        abstracts (required) iterable of (title, abstract) pairs
+        prefix (required) path prefix for the index files
+        redirects (optional) iterable of (redirect, target) pairs
+
+    RETURNS: number of articles indexed
+    """
+
+    aliases = {}
+    for source, target in redirects:
+        aliases.setdefault(title_key(target), []).append(source)
+
+    keys = []
+    count = 0
+    with open(prefix + ".dat", "wb") as data:
+        for title, abstract in abstracts:
+            if not title or not abstract:
+                continue
+            key = title_key(title)
+            record = lead_record(title, abstract, aliases.get(key))
+            offset = data.tell()
+            data.write(json.dumps(record, ensure_ascii=False).encode("utf-8"))
+            data.write(b"\n")
+            keys.append((key, offset))
+            keys.extend((title_key(alias), offset) for alias in record["redirects"])
+            count += 1
+
+    keys.sort()
+    with open(prefix + ".idx", "wb") as index:
+        for key, offset in keys:
+            index.write(KEY.pack(key, offset))
+
+    return count
+
+
+class WikiIndex:
+
+    """Read-only, memory-mapped lookups in a local lead paragraph index """
+
+    def __init__(self, prefix):
+
+        """Map PREFIX.idx and PREFIX.dat into memory """
+
+        self.prefix = prefix
+        self._files = [open(prefix + ".idx", "rb"), open(prefix + ".dat", "rb")]
+        self._keys, self._data = [self._map(f) for f in self._files]
+        self._count = len(self._keys) // KEY.size
+
+    @staticmethod
+    def _map(infile):
+
+        """Memory-map a file; empty files can't be mapped """
+
+        if os.fstat(infile.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _offsets(self, key):
+
+        """Binary search the key index and yield matching record offsets """
+
+        low, high = 0, self._count
+        while low < high:
+            mid = (low + high) // 2
+            if KEY.unpack_from(self._keys, mid * KEY.size)[0] < key:
+                low = mid + 1
+            else:
+                high = mid
+        while low < self._count:
+            found, offset = KEY.unpack_from(self._keys, low * KEY.size)
+            if found != key:
+                break
+            yield offset
+            low += 1
+
+    def record(self, offset):
+
+        """Decode the record stored at the given offset """
+
+        end = self._data.find(b"\n", offset)
+
+        return json.loads(self._data[offset:end].decode("utf-8"))
+
+    def get(self, title):
+
+        """Return the record for a title or redirect, or None """
+
+        key = title_key(title)
+        for offset in self._offsets(key):
+            record = self.record(offset)
+            if key in [title_key(t) for t in [record["title"]] + record["redirects"]]:
+                return record
+
+        return None
+
+    def close(self):
+
+        """Unmap and close the index files """
+
+        for mapped in (self._keys, self._data):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        for infile in self._files:
+            infile.close()
+
+    def __contains__(self, title):
+        return self.get(title) is not None
+
+    def __len__(self):
+        return self._count
+
+    def __repr__(self):
+        return "<WikiIndex {}: {} keys>".format(self.prefix, self._count)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("usage: wikidump.py ABSTRACTS PREFIX [REDIRECTS]")
+        sys.exit(1)
+    REDIRECTS = read_redirects(sys.argv[3]) if len(sys.argv) > 3 else ()
+    print(
+        "Indexed {} articles".format(
+            build_index(read_abstracts(sys.argv[1]), sys.argv[2], REDIRECTS)
+        )
+    )